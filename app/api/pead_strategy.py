@@ -6,11 +6,12 @@ Post-Earnings Announcement Drift trading strategy endpoints
 
 import os
 import sys
+import time
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc, func, text
+from sqlalchemy import and_, desc, func, select, text
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
 import json
@@ -228,11 +229,12 @@ class PEADStrategyAnalyzer:
         """
         try:
             # Check cache first
-            cache_key = f"pead_q{quarter}_{year}"
-            current_time = datetime.now().timestamp()
+            cache_key = (quarter, year)
+            current_time = time.monotonic()
             
-            if cache_key in pead_cache:
-                cache_time, cached_data = pead_cache[cache_key]
+            cached_entry = pead_cache.get(cache_key)
+            if cached_entry is not None:
+                cache_time, cached_data = cached_entry
                 if current_time - cache_time < CACHE_DURATION:
                     logger.info(f"Returning cached PEAD data for Q{quarter} {year}")
                     return cached_data
@@ -439,40 +441,38 @@ async def get_available_dates(db: Session = Depends(get_db)):
     Get available quarters and years for PEAD analysis
     """
     try:
-        from app.models.stock import QuarterlyResult, Stock
-        from sqlalchemy import and_, func
-        
-        # Get available quarters and years from quarterly results
-        available_data = db.query(
-            QuarterlyResult.quarter_number,
-            QuarterlyResult.year,
-            func.min(QuarterlyResult.announcement_date).label('min_date'),
-            func.max(QuarterlyResult.announcement_date).label('max_date')
-        ).filter(
-            and_(
+        # Core select: the grouped rows are read as plain tuples without ORM query overhead
+        available_data = db.execute(
+            select(
+                QuarterlyResult.quarter_number,
+                QuarterlyResult.year,
+                func.min(QuarterlyResult.announcement_date),
+                func.max(QuarterlyResult.announcement_date)
+            ).where(
                 QuarterlyResult.is_consolidated == True,
                 QuarterlyResult.announcement_date.isnot(None),
                 QuarterlyResult.expected_eps.isnot(None),
                 QuarterlyResult.eps.isnot(None)
+            ).group_by(
+                QuarterlyResult.quarter_number,
+                QuarterlyResult.year
+            ).order_by(
+                QuarterlyResult.year.desc(),
+                QuarterlyResult.quarter_number.desc()
             )
-        ).group_by(
-            QuarterlyResult.quarter_number,
-            QuarterlyResult.year
-        ).order_by(
-            QuarterlyResult.year.desc(),
-            QuarterlyResult.quarter_number.desc()
         ).all()
         
         # Format the data
-        quarters = []
-        for data in available_data:
-            quarters.append({
-                'quarter': data.quarter_number,
-                'year': data.year,
-                'min_date': data.min_date.isoformat() if data.min_date else None,
-                'max_date': data.max_date.isoformat() if data.max_date else None,
-                'label': f"Q{data.quarter_number} {data.year}"
-            })
+        quarters = [
+            {
+                'quarter': quarter_number,
+                'year': year,
+                'min_date': min_date.isoformat() if min_date else None,
+                'max_date': max_date.isoformat() if max_date else None,
+                'label': f"Q{quarter_number} {year}"
+            }
+            for quarter_number, year, min_date, max_date in available_data
+        ]
         
         return JSONResponse(content={
             'success': True,
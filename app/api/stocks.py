@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
 
 from app.core.database import get_db
 from app.models.stock import Stock, DailyPrice, QuarterlyResult
@@ -9,6 +10,15 @@ from app.schemas.stock import StockResponse, StockDetailResponse
 
 router = APIRouter()
 
+def _closest_price(dates: List[datetime], closes: List[float], target: datetime, tolerance: timedelta) -> Optional[float]:
+    """Close price on the trading day nearest to target within tolerance, from date-sorted price lists"""
+    lo = bisect_left(dates, target - tolerance)
+    hi = bisect_right(dates, target + tolerance)
+    if lo >= hi:
+        return None
+    nearest = min(range(lo, hi), key=lambda i: abs((dates[i] - target).total_seconds()))
+    return closes[nearest]
+
 @router.get("/stocks", response_model=List[StockResponse])
 async def list_stocks(
     skip: int = Query(0, ge=0),
@@ -44,7 +54,7 @@ async def get_stocks_with_returns(
     try:
         from app.models.stock import DailyPrice
         from datetime import datetime, timedelta
-        from sqlalchemy import and_, func, desc
+        from sqlalchemy import and_, func, or_, tuple_
         
         # Build base query
         query = db.query(Stock).filter(Stock.is_active == True)
@@ -55,6 +65,65 @@ async def get_stocks_with_returns(
             query = query.filter(Stock.industry == industry)
         
         stocks = query.offset(skip).limit(limit).all()
+        stock_ids = [stock.id for stock in stocks]
+        
+        # Periods to calculate returns for
+        periods = [
+            ('1w', 7),
+            ('1m', 30),
+            ('3m', 90),
+            ('6m', 180),
+            ('1y', 365)
+        ]
+        tolerance = timedelta(days=5)
+        
+        # Load the prices for the whole page up front instead of several queries per stock
+        date_bounds = {}
+        if stock_ids:
+            date_bounds = {
+                stock_id: (first_date, last_date)
+                for stock_id, first_date, last_date in db.query(
+                    DailyPrice.stock_id,
+                    func.min(DailyPrice.date),
+                    func.max(DailyPrice.date)
+                ).filter(DailyPrice.stock_id.in_(stock_ids)).group_by(DailyPrice.stock_id)
+            }
+        
+        # Recent prices covering the longest period (plus tolerance) of every stock, ordered by date.
+        # Each stock's window ends at its own latest price, so a stale stock does not widen the scan
+        # for the others; stocks sharing a window start share one IN clause.
+        prices_by_stock = {}
+        earliest_prices = {}
+        if date_bounds:
+            lookback = timedelta(days=max(days for _, days in periods)) + tolerance
+            stocks_by_window = {}
+            for stock_id, (_, last_date) in date_bounds.items():
+                stocks_by_window.setdefault(last_date - lookback, []).append(stock_id)
+            
+            recent_prices = db.query(
+                DailyPrice.stock_id,
+                DailyPrice.date,
+                DailyPrice.close_price
+            ).filter(
+                or_(*(
+                    and_(DailyPrice.stock_id.in_(window_stock_ids), DailyPrice.date >= window_start)
+                    for window_start, window_stock_ids in stocks_by_window.items()
+                ))
+            ).order_by(DailyPrice.stock_id, DailyPrice.date)
+            
+            for stock_id, price_date, close_price in recent_prices:
+                dates, closes = prices_by_stock.setdefault(stock_id, ([], []))
+                dates.append(price_date)
+                closes.append(close_price)
+            
+            earliest_prices = {
+                stock_id: close_price
+                for stock_id, close_price in db.query(DailyPrice.stock_id, DailyPrice.close_price).filter(
+                    tuple_(DailyPrice.stock_id, DailyPrice.date).in_(
+                        [(stock_id, first_date) for stock_id, (first_date, _) in date_bounds.items()]
+                    )
+                )
+            }
         
         # Calculate returns for each stock
         stocks_with_returns = []
@@ -81,59 +150,29 @@ async def get_stocks_with_returns(
                 'returns_all_time': None
             }
             
-            # Get current price (latest close price)
-            current_price_data = db.query(DailyPrice).filter(
-                DailyPrice.stock_id == stock.id
-            ).order_by(desc(DailyPrice.date)).first()
-            
-            if not current_price_data:
+            # Current price is the latest close price
+            if stock.id not in prices_by_stock:
                 stocks_with_returns.append(stock_data)
                 continue
-                
-            current_price = current_price_data.close_price
-            current_date = current_price_data.date
             
-            # Calculate returns for different periods
-            periods = [
-                ('1w', 7),
-                ('1m', 30),
-                ('3m', 90),
-                ('6m', 180),
-                ('1y', 365)
-            ]
+            dates, closes = prices_by_stock[stock.id]
+            current_price = closes[-1]
+            current_date = dates[-1]
             
             for period_name, days in periods:
-                # Get price from the specified days ago
+                # Get price from the specified days ago, using the closest trading day within 5 days of target
                 target_date = current_date - timedelta(days=days)
+                old_price = _closest_price(dates, closes, target_date, tolerance)
                 
-                # Find the closest trading day (within 5 days of target)
-                # Use a simpler approach - get the closest date by absolute difference in seconds
-                price_data = db.query(DailyPrice).filter(
-                    and_(
-                        DailyPrice.stock_id == stock.id,
-                        DailyPrice.date >= target_date - timedelta(days=5),
-                        DailyPrice.date <= target_date + timedelta(days=5)
-                    )
-                ).order_by(
-                    func.abs(func.extract('epoch', DailyPrice.date - target_date))
-                ).first()
-                
-                if price_data and current_price:
-                    old_price = price_data.close_price
-                    if old_price and old_price > 0:
-                        return_pct = ((current_price - old_price) / old_price) * 100
-                        stock_data[f'returns_{period_name}'] = round(return_pct, 2)
+                if old_price and current_price and old_price > 0:
+                    return_pct = ((current_price - old_price) / old_price) * 100
+                    stock_data[f'returns_{period_name}'] = round(return_pct, 2)
             
             # Calculate all-time return (from earliest available data)
-            earliest_price_data = db.query(DailyPrice).filter(
-                DailyPrice.stock_id == stock.id
-            ).order_by(DailyPrice.date.asc()).first()
-            
-            if earliest_price_data and current_price:
-                earliest_price = earliest_price_data.close_price
-                if earliest_price and earliest_price > 0:
-                    return_pct = ((current_price - earliest_price) / earliest_price) * 100
-                    stock_data['returns_all_time'] = round(return_pct, 2)
+            earliest_price = earliest_prices.get(stock.id)
+            if earliest_price and current_price and earliest_price > 0:
+                return_pct = ((current_price - earliest_price) / earliest_price) * 100
+                stock_data['returns_all_time'] = round(return_pct, 2)
             
             stocks_with_returns.append(stock_data)
         
@@ -31,9 +31,12 @@ async def run_daily_sync():
         # Import syncer only when needed
         from scripts.daily_ohlcv_syncer import DailyOHLCVSyncer
         
-        # Run the daily syncer
+        # Run the blocking syncer on a worker thread so the event loop keeps serving requests
         syncer = DailyOHLCVSyncer()
-        result = syncer.sync_all_stocks()
+        try:
+            result = await asyncio.to_thread(syncer.sync_all_stocks)
+        finally:
+            syncer.close()
         
         sync_status["last_success"] = datetime.now().isoformat()
         sync_status["is_running"] = False
@@ -74,15 +77,27 @@ async def test_sync():
     try:
         # Import syncer only when needed
         from scripts.daily_ohlcv_syncer import DailyOHLCVSyncer
+        from app.models.stock import Stock
         
         syncer = DailyOHLCVSyncer()
-        # Test with first stock
-        stocks = syncer.get_all_stocks()
-        if stocks:
-            result = syncer.sync_stock_ohlcv(stocks[0])
+        
+        def _sync_first_stock():
+            # Test with first stock, fetched with LIMIT 1 rather than loading every active stock
+            stock = syncer.db.query(Stock).filter(Stock.is_active == True).first()
+            if not stock:
+                return None, None
+            return stock.name, syncer.sync_stock_ohlcv(stock)
+        
+        # Blocking DB and Yahoo calls run off the event loop
+        try:
+            stock_name, result = await asyncio.to_thread(_sync_first_stock)
+        finally:
+            syncer.close()
+        
+        if stock_name:
             return JSONResponse(
                 status_code=200,
-                content={"message": f"Test sync successful for {stocks[0].name}", "result": result}
+                content={"message": f"Test sync successful for {stock_name}", "result": result}
             )
         else:
             return JSONResponse(
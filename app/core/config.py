@@ -31,6 +31,11 @@ class Settings(BaseSettings):
             return self.database_url_prod if self.database_url_prod else self.database_url_local
         return self.database_url_local
     
+    # Connection pool shared by every session of a process
+    db_pool_size: int = Field(default=20, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=10, env="DB_MAX_OVERFLOW")
+    db_pool_recycle: int = Field(default=300, env="DB_POOL_RECYCLE")
+    
     # Redis
     redis_url: str = Field(default="redis://localhost:6379", env="REDIS_URL")
     redis_host: str = Field(default="localhost", env="REDIS_HOST")
@@ -54,6 +59,9 @@ class Settings(BaseSettings):
     data_collection_interval: int = Field(default=3600, env="DATA_COLLECTION_INTERVAL")
     max_retries: int = Field(default=3, env="MAX_RETRIES")
     request_delay: float = Field(default=1.0, env="REQUEST_DELAY")
+    # On-disk cache of GET responses for repeat runs (seconds, 0 disables; needs requests-cache)
+    http_cache_expire: int = Field(default=0, env="HTTP_CACHE_EXPIRE")
+    http_cache_path: str = Field(default="cache/http_cache", env="HTTP_CACHE_PATH")
     
     # LLM
     llm_model: str = Field(default="gpt-3.5-turbo", env="LLM_MODEL")
@@ -6,8 +6,10 @@ from app.core.config import settings
 # Create database engine
 engine = create_engine(
     settings.effective_database_url.replace('postgresql://', 'postgresql+psycopg2://'),
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
     pool_pre_ping=True,
-    pool_recycle=300,
+    pool_recycle=settings.db_pool_recycle,
     echo=settings.debug
 )
 
@@ -0,0 +1,102 @@
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.core.config import settings
+
+# Optional on-disk response cache, enabled with HTTP_CACHE_EXPIRE
+try:
+    import requests_cache
+    REQUESTS_CACHE_AVAILABLE = True
+except ImportError:
+    REQUESTS_CACHE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+# Status codes worth retrying: rate limiting and transient upstream failures
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Upper bound in seconds for a single backoff wait when the server sends no Retry-After
+RETRY_BACKOFF_MAX = 60
+
+
+class JitteredRetry(Retry):
+    """Exponential backoff plus up to `backoff_factor` seconds of random jitter, capped at RETRY_BACKOFF_MAX.
+    
+    Jitter keeps parallel workers that hit a 429 together from retrying in lockstep,
+    and the first retry also waits instead of firing immediately.
+    """
+    
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time() + random.uniform(0, self.backoff_factor)
+        return min(backoff, RETRY_BACKOFF_MAX)
+
+
+def create_http_session(pool_connections: int = 32, pool_maxsize: int = 64) -> requests.Session:
+    """Create a pooled HTTP session that retries rate-limited requests with jittered exponential backoff."""
+    retry = JitteredRetry(
+        total=settings.max_retries,
+        backoff_factor=2,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    
+    session = _create_cached_session() if settings.http_cache_expire > 0 else None
+    if session is None:
+        session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _create_cached_session():
+    """Session that serves repeat GETs from a local SQLite cache, so re-runs skip the network."""
+    if not REQUESTS_CACHE_AVAILABLE:
+        logger.warning("⚠️ HTTP_CACHE_EXPIRE is set but requests-cache is not installed. Install with: pip install requests-cache")
+        return None
+    
+    return requests_cache.CachedSession(
+        settings.http_cache_path,
+        backend='sqlite',
+        expire_after=settings.http_cache_expire,
+        allowable_methods=('GET', 'HEAD')
+    )
+
+
+class TokenBucket:
+    """Thread-safe token bucket that paces outbound requests to `rate` per second.
+    
+    Unlike a fixed sleep after every request, time spent doing the request itself
+    counts towards the interval, and concurrent workers share one budget.
+    A rate of zero or less disables limiting.
+    """
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
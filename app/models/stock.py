@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, BigInteger, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, BigInteger, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -71,6 +71,9 @@ class DailyPrice(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    # Price lookups always filter by stock and date range
+    __table_args__ = (Index('ix_daily_prices_stock_date', 'stock_id', 'date'),)
+    
     # Relationship
     stock = relationship("Stock", back_populates="daily_prices")
 
@@ -122,6 +125,12 @@ class QuarterlyResult(Base):
     source = Column(String(20), default='BSE')  # Data source: BSE, Yahoo Finance, etc.
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    # One row per stock and quarter (conflict target for upserts)
+    __table_args__ = (
+        UniqueConstraint('stock_id', 'quarter', 'year', name='uq_quarterly_stock_quarter_year'),
+        Index('ix_qr_stock_source', 'stock_id', 'source'),
+    )
+    
     # Relationship
     stock = relationship("Stock", back_populates="quarterly_results")
 
@@ -1,28 +1,81 @@
 import asyncio
+import json
 import logging
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Optional, Any
 from datetime import datetime, timedelta
-import requests
 import yfinance as yf
 import pandas as pd
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.core.http import TokenBucket, create_http_session
 from app.models.stock import Stock, DailyPrice, QuarterlyResult, FinancialStatement
 from app.core.database import get_db
 
 logger = logging.getLogger(__name__)
 
 
+# Yahoo quarterly line items mapped to QuarterlyResult fields, stored in crores
+YAHOO_FINANCIAL_FIELDS = {
+    'Total Revenue': 'revenue',
+    'Net Income': 'net_profit',
+    'EBITDA': 'ebitda',
+    'Operating Income': 'operating_profit'
+}
+
+
+def _frame_to_records(frame: pd.DataFrame, columns: List[str], scale: float = 1.0) -> Dict[Any, Dict[str, Any]]:
+    """Cast, scale and null-mask the given columns in one vectorised pass, keyed by index."""
+    values = frame[columns].astype(float) / scale
+    return values.astype(object).where(values.notna(), None).to_dict('index')
+
+
+def _build_quarterly_results(quarterly_earnings: pd.DataFrame, quarterly_financials: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Turn downloaded Yahoo quarterly frames into result dicts (pure transform, no I/O)."""
+    results_by_quarter = {}
+    
+    if not quarterly_earnings.empty:
+        has_earnings = 'Earnings' in quarterly_earnings.columns
+        earnings = _frame_to_records(quarterly_earnings, ['Earnings'] if has_earnings else [])
+        for date, row in earnings.items():
+            quarter = f"Q{date.quarter} {date.year}"
+            results_by_quarter.setdefault(quarter, {
+                'quarter': quarter,
+                'year': date.year,
+                'quarter_number': date.quarter,
+                'eps': row['Earnings'] if has_earnings else 0,
+                'is_consolidated': True
+            })
+    
+    if not quarterly_financials.empty:
+        # Missing line items default to 0 as before; blank cells become None rather than NaN
+        present = [column for column in YAHOO_FINANCIAL_FIELDS if column in quarterly_financials.columns]
+        missing = {field: 0 for column, field in YAHOO_FINANCIAL_FIELDS.items() if column not in present}
+        financials = _frame_to_records(quarterly_financials, present, scale=10000000)  # Convert to crores
+        for date, row in financials.items():
+            # Find matching quarter result
+            existing_result = results_by_quarter.get(f"Q{date.quarter} {date.year}")
+            
+            if existing_result:
+                existing_result.update(missing)
+                existing_result.update({YAHOO_FINANCIAL_FIELDS[column]: value for column, value in row.items()})
+    
+    return list(results_by_quarter.values())
+
+
 class DataCollectorService:
     """Service for collecting stock market data from various sources."""
     
     def __init__(self):
         """Initialize the data collector service."""
-        self.session = requests.Session()
+        # Pooled keep-alive connections with backoff on rate limits, shared with yfinance tickers
+        self.session = create_http_session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        # One request per settings.request_delay seconds, counted from the start of each request
+        self.rate_limiter = TokenBucket(1 / settings.request_delay if settings.request_delay > 0 else 0)
     
     def collect_nse_data(self, db: Session) -> List[Dict[str, Any]]:
         """Collect data from NSE website."""
@@ -32,8 +85,8 @@ class DataCollectorService:
             # NSE equity list URL
             nse_url = "https://www.nseindia.com/api/equity-stockIndices?index=SECURITIES%20IN%20F%26O"
             
-            # Add delay to respect rate limits
-            time.sleep(settings.request_delay)
+            # Respect rate limits
+            self.rate_limiter.acquire()
             
             response = self.session.get(nse_url)
             if response.status_code != 200:
@@ -72,8 +125,8 @@ class DataCollectorService:
             # BSE equity list URL (this is a simplified approach)
             bse_url = "https://www.bseindia.com/markets/equity/EQReports/bulk_deals.aspx"
             
-            # Add delay to respect rate limits
-            time.sleep(settings.request_delay)
+            # Respect rate limits
+            self.rate_limiter.acquire()
             
             # Note: BSE has more complex data structure, this is a placeholder
             # In practice, you'd need to parse the HTML or use their API
@@ -95,8 +148,11 @@ class DataCollectorService:
             
             for symbol in symbols:
                 try:
+                    # Respect rate limits
+                    self.rate_limiter.acquire()
+                    
                     # Add .NS suffix for NSE stocks
-                    ticker = yf.Ticker(f"{symbol}.NS")
+                    ticker = yf.Ticker(f"{symbol}.NS", session=self.session)
                     info = ticker.info
                     
                     # Get historical data for technical indicators
@@ -120,9 +176,6 @@ class DataCollectorService:
                     
                     stocks_data.append(stock_info)
                     
-                    # Add delay to respect rate limits
-                    time.sleep(settings.request_delay)
-                    
                 except Exception as e:
                     logger.warning(f"Error collecting data for {symbol}: {e}")
                     continue
@@ -134,27 +187,32 @@ class DataCollectorService:
             logger.error(f"Error collecting Yahoo Finance data: {e}")
             return []
     
-    def collect_daily_prices(self, db: Session, stock_symbol: str, days: int = 30) -> List[Dict[str, Any]]:
-        """Collect daily price data for a specific stock."""
+    def collect_daily_prices(self, db: Session, stock_symbol: str, days: int = 30, ticker: Optional[yf.Ticker] = None) -> List[Dict[str, Any]]:
+        """Collect daily price data for a specific stock, reusing a shared ticker if given."""
         try:
             logger.info(f"Collecting daily prices for {stock_symbol}")
             
             # Use Yahoo Finance for historical data
-            ticker = yf.Ticker(f"{stock_symbol}.NS")
+            if ticker is None:
+                ticker = yf.Ticker(f"{stock_symbol}.NS", session=self.session)
             hist = ticker.history(period=f"{days}d")
             
-            prices_data = []
-            for date, row in hist.iterrows():
-                price_info = {
-                    'date': date.to_pydatetime(),
-                    'open_price': float(row['Open']),
-                    'high_price': float(row['High']),
-                    'low_price': float(row['Low']),
-                    'close_price': float(row['Close']),
-                    'volume': int(row['Volume']),
-                    'turnover': float(row['Open'] * row['Volume'])  # Approximate
+            # Extract columns once rather than iterating row Series
+            prices = hist[['Open', 'High', 'Low', 'Close']].to_numpy(dtype='float64').tolist()
+            volumes = hist['Volume'].to_numpy(dtype='int64').tolist()
+            prices_data = [
+                {
+                    'date': date,
+                    'open_price': open_price,
+                    'high_price': high_price,
+                    'low_price': low_price,
+                    'close_price': close_price,
+                    'volume': volume,
+                    'turnover': float(open_price * volume)  # Approximate
                 }
-                prices_data.append(price_info)
+                for date, (open_price, high_price, low_price, close_price), volume
+                in zip(hist.index.to_pydatetime(), prices, volumes)
+            ]
             
             logger.info(f"Collected {len(prices_data)} daily prices for {stock_symbol}")
             return prices_data
@@ -163,44 +221,20 @@ class DataCollectorService:
             logger.error(f"Error collecting daily prices for {stock_symbol}: {e}")
             return []
     
-    def collect_quarterly_results(self, db: Session, stock_symbol: str) -> List[Dict[str, Any]]:
-        """Collect quarterly financial results."""
+    def collect_quarterly_results(self, db: Session, stock_symbol: str, ticker: Optional[yf.Ticker] = None) -> List[Dict[str, Any]]:
+        """Collect quarterly financial results, reusing a shared ticker if given."""
         try:
             logger.info(f"Collecting quarterly results for {stock_symbol}")
             
             # Use Yahoo Finance for financial data
-            ticker = yf.Ticker(f"{stock_symbol}.NS")
+            if ticker is None:
+                ticker = yf.Ticker(f"{stock_symbol}.NS", session=self.session)
             
             # Get quarterly earnings
             quarterly_earnings = ticker.quarterly_earnings
             quarterly_financials = ticker.quarterly_financials
             
-            results_data = []
-            
-            if not quarterly_earnings.empty:
-                for date, row in quarterly_earnings.iterrows():
-                    quarter_info = {
-                        'quarter': f"Q{date.quarter} {date.year}",
-                        'year': date.year,
-                        'quarter_number': date.quarter,
-                        'eps': float(row['Earnings']) if 'Earnings' in row else 0,
-                        'is_consolidated': True
-                    }
-                    results_data.append(quarter_info)
-            
-            if not quarterly_financials.empty:
-                for date, row in quarterly_financials.iterrows():
-                    # Find matching quarter result
-                    quarter = f"Q{date.quarter} {date.year}"
-                    existing_result = next((r for r in results_data if r['quarter'] == quarter), None)
-                    
-                    if existing_result:
-                        existing_result.update({
-                            'revenue': float(row.get('Total Revenue', 0)) / 10000000,  # Convert to crores
-                            'net_profit': float(row.get('Net Income', 0)) / 10000000,
-                            'ebitda': float(row.get('EBITDA', 0)) / 10000000 if 'EBITDA' in row else 0,
-                            'operating_profit': float(row.get('Operating Income', 0)) / 10000000 if 'Operating Income' in row else 0
-                        })
+            results_data = _build_quarterly_results(quarterly_earnings, quarterly_financials)
             
             logger.info(f"Collected {len(results_data)} quarterly results for {stock_symbol}")
             return results_data
@@ -209,13 +243,20 @@ class DataCollectorService:
             logger.error(f"Error collecting quarterly results for {stock_symbol}: {e}")
             return []
     
-    def collect_financial_statements(self, db: Session, stock_symbol: str) -> List[Dict[str, Any]]:
-        """Collect financial statements (P&L, Balance Sheet, Cash Flow)."""
+    @staticmethod
+    def _statement_columns_to_json(statement: pd.DataFrame) -> List[str]:
+        """Serialize each period column of a statement to JSON from a single frame conversion."""
+        columns = statement.astype(object).where(statement.notna(), None).to_dict()
+        return [json.dumps(values, separators=(',', ':')) for values in columns.values()]
+    
+    def collect_financial_statements(self, db: Session, stock_symbol: str, ticker: Optional[yf.Ticker] = None) -> List[Dict[str, Any]]:
+        """Collect financial statements (P&L, Balance Sheet, Cash Flow), reusing a shared ticker if given."""
         try:
             logger.info(f"Collecting financial statements for {stock_symbol}")
             
             # Use Yahoo Finance for financial data
-            ticker = yf.Ticker(f"{stock_symbol}.NS")
+            if ticker is None:
+                ticker = yf.Ticker(f"{stock_symbol}.NS", session=self.session)
             
             # Get annual financials
             annual_financials = ticker.financials
@@ -226,42 +267,42 @@ class DataCollectorService:
             
             # Process P&L statement
             if not annual_financials.empty:
-                for date in annual_financials.columns:
+                for date, data_json in zip(annual_financials.columns, self._statement_columns_to_json(annual_financials)):
                     year = date.year
                     data = {
                         'statement_type': 'P&L',
                         'period': 'Annual',
                         'year': year,
                         'quarter': None,
-                        'data': annual_financials[date].to_json(),
+                        'data': data_json,
                         'is_consolidated': True
                     }
                     statements_data.append(data)
             
             # Process Balance Sheet
             if not annual_balance.empty:
-                for date in annual_balance.columns:
+                for date, data_json in zip(annual_balance.columns, self._statement_columns_to_json(annual_balance)):
                     year = date.year
                     data = {
                         'statement_type': 'Balance Sheet',
                         'period': 'Annual',
                         'year': year,
                         'quarter': None,
-                        'data': annual_balance[date].to_json(),
+                        'data': data_json,
                         'is_consolidated': True
                     }
                     statements_data.append(data)
             
             # Process Cash Flow
             if not annual_cashflow.empty:
-                for date in annual_cashflow.columns:
+                for date, data_json in zip(annual_cashflow.columns, self._statement_columns_to_json(annual_cashflow)):
                     year = date.year
                     data = {
                         'statement_type': 'Cash Flow',
                         'period': 'Annual',
                         'year': year,
                         'quarter': None,
-                        'data': annual_cashflow[date].to_json(),
+                        'data': data_json,
                         'is_consolidated': True
                     }
                     statements_data.append(data)
@@ -278,26 +319,43 @@ class DataCollectorService:
         try:
             logger.info("Updating stock database...")
             
+            # Match every incoming row against existing stocks with one query
+            nse_symbols = {data['nse_symbol'] for data in stocks_data if data.get('nse_symbol')}
+            bse_symbols = {data['bse_symbol'] for data in stocks_data if data.get('bse_symbol')}
+            existing = db.query(Stock.id, Stock.nse_symbol, Stock.bse_symbol).filter(
+                Stock.nse_symbol.in_(nse_symbols) | Stock.bse_symbol.in_(bse_symbols)
+            ).all()
+            stocks_by_nse = {row.nse_symbol: row.id for row in existing if row.nse_symbol}
+            stocks_by_bse = {row.bse_symbol: row.id for row in existing if row.bse_symbol}
+            
+            stock_columns = set(Stock.__table__.columns.keys()) - {'id'}
+            updates_by_id = {}
             updated_count = 0
             
             for stock_data in stocks_data:
                 try:
-                    # Check if stock exists
-                    stock = db.query(Stock).filter(
-                        (Stock.nse_symbol == stock_data.get('nse_symbol')) |
-                        (Stock.bse_symbol == stock_data.get('bse_symbol'))
-                    ).first()
+                    nse_symbol = stock_data.get('nse_symbol')
+                    bse_symbol = stock_data.get('bse_symbol')
+                    stock = stocks_by_nse.get(nse_symbol) or stocks_by_bse.get(bse_symbol)
                     
-                    if stock:
-                        # Update existing stock
+                    if isinstance(stock, Stock):
+                        # Stock added earlier in this batch, merge into the pending insert
                         for key, value in stock_data.items():
-                            if hasattr(stock, key) and value is not None:
+                            if key in stock_columns and value is not None:
                                 setattr(stock, key, value)
-                        stock.updated_at = datetime.now()
+                    elif stock:
+                        # Update existing stock, collected into one bulk UPDATE by primary key
+                        values = updates_by_id.setdefault(stock, {'id': stock})
+                        values.update({key: value for key, value in stock_data.items() if key in stock_columns and value is not None})
+                        values['updated_at'] = datetime.now()
                     else:
                         # Create new stock
                         stock = Stock(**stock_data)
                         db.add(stock)
+                        if nse_symbol:
+                            stocks_by_nse[nse_symbol] = stock
+                        if bse_symbol:
+                            stocks_by_bse[bse_symbol] = stock
                     
                     updated_count += 1
                     
@@ -305,6 +363,8 @@ class DataCollectorService:
                     logger.warning(f"Error updating stock {stock_data.get('nse_symbol', 'Unknown')}: {e}")
                     continue
             
+            if updates_by_id:
+                db.execute(update(Stock), list(updates_by_id.values()))
             db.commit()
             logger.info(f"Successfully updated {updated_count} stocks in database")
             return updated_count
@@ -337,26 +397,32 @@ class DataCollectorService:
             # Get list of active stocks
             active_stocks = db.query(Stock).filter(Stock.is_active == True).all()
             
+            # Collectors for each data type, run concurrently per stock since their Yahoo calls are independent
+            collectors = {
+                'daily_prices_collected': self.collect_daily_prices,
+                'quarterly_results_collected': self.collect_quarterly_results,
+                'financial_statements_collected': self.collect_financial_statements
+            }
+            
             # Collect detailed data for each stock
-            for stock in active_stocks[:10]:  # Limit to first 10 for demo
-                symbol = stock.nse_symbol or stock.bse_symbol
-                if not symbol:
-                    continue
-                
-                # Collect daily prices
-                daily_prices = self.collect_daily_prices(db, symbol)
-                results['daily_prices_collected'] += len(daily_prices)
-                
-                # Collect quarterly results
-                quarterly_results = self.collect_quarterly_results(db, symbol)
-                results['quarterly_results_collected'] += len(quarterly_results)
-                
-                # Collect financial statements
-                financial_statements = self.collect_financial_statements(db, symbol)
-                results['financial_statements_collected'] += len(financial_statements)
-                
-                # Add delay between stocks
-                time.sleep(settings.request_delay)
+            with ThreadPoolExecutor(max_workers=len(collectors)) as executor:
+                for stock in active_stocks[:10]:  # Limit to first 10 for demo
+                    symbol = stock.nse_symbol or stock.bse_symbol
+                    if not symbol:
+                        continue
+                    
+                    # Pace stocks to respect rate limits
+                    self.rate_limiter.acquire()
+                    
+                    # One ticker per stock shared by all collectors, so yfinance resolves the symbol once
+                    # Collectors only read from Yahoo, so they never touch the shared db session
+                    ticker = yf.Ticker(f"{symbol}.NS", session=self.session)
+                    futures = {
+                        executor.submit(collect, db, symbol, ticker=ticker): key
+                        for key, collect in collectors.items()
+                    }
+                    for future in as_completed(futures):
+                        results[futures[future]] += len(future.result())
             
             logger.info(f"Data collection completed: {results}")
             return results
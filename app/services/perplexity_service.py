@@ -2,9 +2,9 @@ import json
 import logging
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-import requests
 from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.core.http import create_http_session
 from app.models.stock import Stock, DailyPrice, QuarterlyResult, FinancialStatement
 from app.schemas.chat import ChatRequest, ChatResponse, StockAnalysisResponse
 
@@ -21,6 +21,13 @@ class PerplexityService:
         
         self.api_key = settings.perplexity_api_key
         self.base_url = "https://api.perplexity.ai/chat/completions"
+        
+        # Keep-alive session so chat turns reuse one TLS connection to the API
+        self.session = create_http_session(pool_connections=1, pool_maxsize=8)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
     
     def _get_stock_context(self, db: Session, stock_symbol: str) -> Optional[Dict[str, Any]]:
         """Get comprehensive stock context for LLM analysis."""
@@ -127,11 +134,6 @@ class PerplexityService:
     def _call_perplexity_api(self, messages: List[Dict], max_tokens: int = 1000) -> str:
         """Call Perplexity API."""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
             payload = {
                 "model": "llama-3.1-sonar-small-128k-online",
                 "messages": messages,
@@ -139,7 +141,7 @@ class PerplexityService:
                 "temperature": 0.7
             }
             
-            response = requests.post(self.base_url, headers=headers, json=payload)
+            response = self.session.post(self.base_url, json=payload)
             response.raise_for_status()
             
             result = response.json()
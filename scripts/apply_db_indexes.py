@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Database Index Migration
+
+Creates indexes and unique constraints on existing databases that were created
+before they were declared on the models. create_tables() only handles new tables,
+so run this once against each environment after pulling the model changes.
+
+Every statement is idempotent (IF NOT EXISTS), so the script is safe to re-run.
+Duplicate rows that would block a unique index are removed first, keeping the
+most recently inserted row of each group.
+
+Usage:
+    python scripts/apply_db_indexes.py
+"""
+
+import os
+import sys
+import logging
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.database import engine
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# (name, DDL) pairs; names match the ones declared in app/models/stock.py
+INDEX_STATEMENTS = [
+    (
+        'uq_quarterly_stock_quarter_year',
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_quarterly_stock_quarter_year '
+        'ON quarterly_results (stock_id, quarter, year)'
+    ),
+    (
+        'ix_qr_stock_source',
+        'CREATE INDEX IF NOT EXISTS ix_qr_stock_source '
+        'ON quarterly_results (stock_id, source)'
+    ),
+    (
+        'ix_daily_prices_stock_date',
+        'CREATE INDEX IF NOT EXISTS ix_daily_prices_stock_date '
+        'ON daily_prices (stock_id, date)'
+    ),
+]
+
+# Cleanup run in the same transaction before a unique index is created; keeps the newest row per key
+DEDUPE_STATEMENTS = {
+    'uq_quarterly_stock_quarter_year': (
+        'DELETE FROM quarterly_results WHERE id NOT IN ('
+        'SELECT MAX(id) FROM quarterly_results GROUP BY stock_id, quarter, year)'
+    ),
+}
+
+
+def apply_indexes() -> int:
+    """Apply every index statement, returning the number that failed"""
+    failed = 0
+    for name, ddl in INDEX_STATEMENTS:
+        try:
+            with engine.begin() as connection:
+                if name in DEDUPE_STATEMENTS:
+                    removed = connection.execute(text(DEDUPE_STATEMENTS[name])).rowcount
+                    if removed:
+                        logger.info(f"🧹 Removed {removed} duplicate rows before creating {name}")
+                connection.execute(text(ddl))
+            logger.info(f"✅ Ensured index {name}")
+        except Exception as e:
+            logger.error(f"❌ Could not create index {name}: {e}")
+            failed += 1
+    return failed
+
+
+def main():
+    """Main function"""
+    failed = apply_indexes()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -79,9 +79,10 @@ import sys
 import os
 import time
 import re
-import requests
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Sequence, Tuple
 from decimal import Decimal
 # import yfinance as yf
 import pandas as pd
@@ -103,7 +104,11 @@ except ImportError:
 # Add the project root to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import bindparam, func, inspect, select
+from sqlalchemy.dialects.postgresql import insert
+
 from app.core.database import SessionLocal
+from app.core.http import TokenBucket, create_http_session
 from app.models.stock import Stock, QuarterlyResult, SyncTracker
 
 # Configure logging
@@ -117,15 +122,78 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Pace of BSE page loads (one every 3 seconds), counted from the start of each request
+BSE_REQUESTS_PER_SECOND = 1 / 3
+
+# Quarterly results only change once a quarter; stocks synced successfully within this window are skipped
+QUARTERLY_RESYNC_DAYS = 30
+
+# Stocks synced by main() as a smoke test before offering the full run
+TEST_SYMBOLS = ('HDFCBANK', 'ITC', 'DLF')
+
+# BSE income statement row labels (lower-cased) mapped to QuarterlyResult fields
+BSE_METRIC_FIELDS = {
+    'revenue': 'revenue',
+    'sales': 'revenue',  # BSE sometimes uses 'Sales' instead of 'Revenue'
+    'other income': 'other_income',
+    'total income': 'total_income',
+    'expenditure': 'expenditure',
+    'expenses': 'expenditure',  # BSE sometimes uses 'Expenses'
+    'interest': 'interest',
+    'pbdt': 'pbdt',
+    'depreciation': 'depreciation',
+    'pbt': 'pbt',
+    'profit before tax': 'pbt',  # Alternative name
+    'tax': 'tax',
+    'net profit': 'net_profit',
+    'equity': 'equity',
+    'eps': 'eps',
+    'ceps': 'ceps',
+    'opm %': 'opm_percent',
+    'npm %': 'npm_percent'
+}
+# Matches any row label that mentions one of the metrics above
+_BSE_METRIC_PATTERN = re.compile('|'.join(re.escape(metric) for metric in BSE_METRIC_FIELDS))
+
+
+@lru_cache(maxsize=256)
+def _is_bse_metric(label: str) -> bool:
+    """Whether a lower-cased row label is a metric we store; BSE reuses a few dozen labels across all stocks"""
+    return _BSE_METRIC_PATTERN.search(label) is not None
+
+
+# Quarterly upsert built once for the fixed schema and executed with one parameter set per quarter.
+# On conflict, columns missing from a scraped record (bound as NULL) keep their stored value, while
+# every value the record does carry replaces the stored one. Column defaults are only bound for
+# quarters that do not exist yet (see save_quarterly_batch), so they never overwrite stored values.
+_QUARTERLY_CONFLICT_KEYS = ('stock_id', 'quarter', 'year')
+_QUARTERLY_COLUMNS = {
+    column.name: column.default.arg if column.default is not None and column.default.is_scalar else None
+    for column in QuarterlyResult.__table__.columns
+    if column.name != 'id' and column.server_default is None
+}
+_QUARTERLY_UPSERT = insert(QuarterlyResult).values({name: bindparam(name) for name in _QUARTERLY_COLUMNS})
+_QUARTERLY_UPSERT = _QUARTERLY_UPSERT.on_conflict_do_update(
+    index_elements=list(_QUARTERLY_CONFLICT_KEYS),
+    set_={
+        name: func.coalesce(_QUARTERLY_UPSERT.excluded[name], QuarterlyResult.__table__.c[name])
+        for name in _QUARTERLY_COLUMNS if name not in _QUARTERLY_CONFLICT_KEYS
+    }
+)
+
 class BSEQuarterlySyncer:
     """BSE Quarterly Results Syncer (BSE only - Yahoo Finance fallback commented out)"""
     
     def __init__(self):
-        self.session = requests.Session()
+        self.session = create_http_session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
         self.base_url = "https://www.bseindia.com/stock-share-price"
+        self.rate_limiter = TokenBucket(BSE_REQUESTS_PER_SECOND)
+        
+        # Filing/announcement date stamped on parsed records; refreshed once per stock sync
+        self.sync_date = datetime.now().date()
         
         # Initialize Selenium driver if available
         self.driver = None
@@ -166,6 +234,42 @@ class BSEQuarterlySyncer:
         except Exception as e:
             logger.warning(f"Error closing Selenium driver: {e}")
     
+    def has_quarterly_upsert_index(self) -> bool:
+        """Check that quarterly_results has the unique key the upsert's ON CONFLICT relies on
+        
+        Databases created before the constraint was declared only get it from
+        scripts/apply_db_indexes.py; without it every quarterly upsert would fail.
+        """
+        def _check(session):
+            inspector = inspect(session.connection())
+            unique_keys = [
+                constraint['column_names'] for constraint in inspector.get_unique_constraints('quarterly_results')
+            ] + [
+                index['column_names'] for index in inspector.get_indexes('quarterly_results') if index.get('unique')
+            ]
+            return any(set(columns) == set(_QUARTERLY_CONFLICT_KEYS) for columns in unique_keys)
+        
+        if self.safe_db_operation(_check):
+            return True
+        logger.error(
+            "❌ quarterly_results has no unique key on (stock_id, quarter, year); "
+            "run scripts/apply_db_indexes.py before syncing"
+        )
+        return False
+    
+    @contextmanager
+    def session_scope(self):
+        """Provide one session for a unit of work, committing once at the end"""
+        session = self.get_db_session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.close_session(session)
+    
     def safe_db_operation(self, operation_func, *args, **kwargs):
         """Safely execute database operations with session management"""
         max_retries = 3
@@ -195,53 +299,112 @@ class BSEQuarterlySyncer:
             finally:
                 self.close_session(session)
     
-    def get_sync_tracker(self, stock_id: int, data_type: str) -> Optional[Dict[str, Any]]:
+    def get_sync_tracker(self, stock_id: int, data_type: str, session=None) -> Optional[Dict[str, Any]]:
         """Get or create sync tracker for a stock and data type"""
         def _get_tracker(session):
-            tracker = session.query(SyncTracker).filter(
-                SyncTracker.stock_id == stock_id,
-                SyncTracker.data_type == data_type
-            ).first()
-            
-            if not tracker:
-                tracker = SyncTracker(
-                    stock_id=stock_id,
-                    data_type=data_type,
-                    last_sync_time=datetime.utcnow()
+            row = session.execute(
+                self._tracker_select().where(
+                    SyncTracker.stock_id == stock_id,
+                    SyncTracker.data_type == data_type
                 )
-                session.add(tracker)
-                session.flush()
-            
-            return {
-                'id': tracker.id,
-                'stock_id': tracker.stock_id,
-                'data_type': tracker.data_type,
-                'last_sync_time': tracker.last_sync_time,
-                'last_data_date': tracker.last_data_date,
-                'records_count': tracker.records_count,
-                'sync_status': tracker.sync_status,
-                'error_message': tracker.error_message
-            }
+            ).mappings().first()
+            
+            if row:
+                return dict(row)
+            
+            tracker = SyncTracker(
+                stock_id=stock_id,
+                data_type=data_type,
+                last_sync_time=datetime.utcnow()
+            )
+            session.add(tracker)
+            session.flush()
+            
+            return self._tracker_to_dict(tracker)
         
+        if session is not None:
+            return _get_tracker(session)
         return self.safe_db_operation(_get_tracker)
     
+    def _tracker_select(self):
+        """Core select of the tracker columns, returned as plain rows without building ORM instances"""
+        return select(
+            SyncTracker.id,
+            SyncTracker.stock_id,
+            SyncTracker.data_type,
+            SyncTracker.last_sync_time,
+            SyncTracker.last_data_date,
+            SyncTracker.records_count,
+            SyncTracker.sync_status,
+            SyncTracker.error_message
+        )
+    
+    def _tracker_to_dict(self, tracker: SyncTracker) -> Dict[str, Any]:
+        """Convert a SyncTracker row into a plain dict usable after the session closes"""
+        return {
+            'id': tracker.id,
+            'stock_id': tracker.stock_id,
+            'data_type': tracker.data_type,
+            'last_sync_time': tracker.last_sync_time,
+            'last_data_date': tracker.last_data_date,
+            'records_count': tracker.records_count,
+            'sync_status': tracker.sync_status,
+            'error_message': tracker.error_message
+        }
+    
+    def preload_stocks(self, symbols: Sequence[str]) -> Dict[str, Stock]:
+        """Load stocks for many NSE symbols in a single query, keyed by NSE symbol"""
+        session = self.get_db_session()
+        try:
+            stocks = session.query(Stock).filter(Stock.nse_symbol.in_(symbols)).all()
+            # Read-only session, so instances keep their loaded state once detached
+            return {stock.nse_symbol: stock for stock in stocks}
+        finally:
+            self.close_session(session)
+    
+    def preload_trackers(self, stock_ids: List[int], data_type: str) -> Dict[int, Dict[str, Any]]:
+        """Load sync trackers of one data type for many stocks in a single query, keyed by stock id"""
+        def _load_trackers(session):
+            rows = session.execute(
+                self._tracker_select().where(
+                    SyncTracker.stock_id.in_(stock_ids),
+                    SyncTracker.data_type == data_type
+                )
+            ).mappings().all()
+            return {row['stock_id']: dict(row) for row in rows}
+        
+        if not stock_ids:
+            return {}
+        return self.safe_db_operation(_load_trackers)
+    
     def update_sync_tracker(self, stock_id: int, data_type: str, last_data_date: datetime, 
-                           records_count: int, status: str = 'success', error_msg: str = None):
-        """Update sync tracker with latest sync information"""
+                           records_count: int, status: str = 'success', error_msg: str = None, session=None):
+        """Record the latest sync of a stock, creating its tracker on first use
+        
+        A single INSERT ... ON CONFLICT (stock_id, data_type) DO UPDATE, so no read is needed
+        whether or not the tracker exists yet.
+        """
         def _update_tracker(session):
-            tracker = session.query(SyncTracker).filter(
-                SyncTracker.stock_id == stock_id,
-                SyncTracker.data_type == data_type
-            ).first()
-            
-            if tracker:
-                tracker.last_sync_time = datetime.utcnow()
-                tracker.last_data_date = last_data_date
-                tracker.records_count = records_count
-                tracker.sync_status = status
-                tracker.error_message = error_msg
+            now = datetime.utcnow()
+            values = {
+                'last_sync_time': now,
+                'last_data_date': last_data_date,
+                'records_count': records_count,
+                'sync_status': status,
+                'error_message': error_msg,
+                'updated_at': now
+            }
+            statement = insert(SyncTracker).values(
+                stock_id=stock_id, data_type=data_type, created_at=now, **values
+            )
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['stock_id', 'data_type'], set_=values
+            ))
         
-        self.safe_db_operation(_update_tracker)
+        if session is not None:
+            _update_tracker(session)
+        else:
+            self.safe_db_operation(_update_tracker)
     
     def scrape_bse_quarterly_results(self, stock: Stock) -> List[Dict[str, Any]]:
         """Scrape quarterly results from BSE website using Selenium for JavaScript content
@@ -266,6 +429,9 @@ class BSEQuarterlySyncer:
             url = f"{self.base_url}/{company_name}/{nse_symbol}/{bse_code}/financials-results/"
             logger.info(f"🔍 Scraping BSE URL: {url}")
             
+            # Be respectful to BSE servers
+            self.rate_limiter.acquire()
+            
             # Use Selenium if available, otherwise fall back to requests
             if self.driver and SELENIUM_AVAILABLE:
                 return self._scrape_with_selenium(url, stock)
@@ -354,7 +520,7 @@ class BSEQuarterlySyncer:
                             header_texts = [col.text.strip() for col in cols[:3]]  # First 3 headers
                             logger.info(f"📋 Table {i+1} headers: {header_texts}")
                     except Exception as e:
-                        logger.debug(f"Error analyzing table {i+1}: {e}")
+                        logger.debug("Error analyzing table %s: %s", i + 1, e)
                         
             except Exception as e:
                 logger.warning(f"⚠️ Could not analyze tables: {e}")
@@ -370,7 +536,7 @@ class BSEQuarterlySyncer:
                         div_text = div.text.strip()[:200]  # First 200 characters
                         logger.info(f"📋 Financial div {i+1}: {div_text}...")
                     except Exception as e:
-                        logger.debug(f"Error reading div {i+1}: {e}")
+                        logger.debug("Error reading div %s: %s", i + 1, e)
                         
             except Exception as e:
                 logger.warning(f"⚠️ Could not analyze financial divs: {e}")
@@ -444,7 +610,7 @@ class BSEQuarterlySyncer:
                                         logger.info(f"✅ Found quarterly results table with selector {i+1}")
                                         return self._parse_bse_html(soup, stock)
                                 except Exception as e:
-                                    logger.debug(f"Error processing table: {e}")
+                                    logger.debug("Error processing table: %s", e)
                                     continue
                         
                         # If we found divs with financial content, look for tables within them
@@ -460,7 +626,7 @@ class BSEQuarterlySyncer:
                                             logger.info(f"✅ Found quarterly results table within div using selector {i+1}")
                                             return self._parse_bse_html(soup, stock)
                                 except Exception as e:
-                                    logger.debug(f"Error processing div: {e}")
+                                    logger.debug("Error processing div: %s", e)
                                     continue
                         
                         # If we found AngularJS tables, handle them specially
@@ -486,7 +652,7 @@ class BSEQuarterlySyncer:
                                             logger.info(f"✅ Found quarterly results table after waiting with AngularJS selector {i+1}")
                                             return self._parse_bse_html(soup, stock)
                                 except Exception as e:
-                                    logger.debug(f"Error processing AngularJS table: {e}")
+                                    logger.debug("Error processing AngularJS table: %s", e)
                                     continue
                         
                         # If we found month abbreviations, look for the containing table
@@ -541,16 +707,16 @@ class BSEQuarterlySyncer:
                                             logger.info(f"✅ Found quarterly results table from month abbreviation using selector {i+1}")
                                             return self._parse_bse_html(soup, stock)
                                         else:
-                                            logger.debug(f"Table found but doesn't contain quarterly data")
+                                            logger.debug("Table found but doesn't contain quarterly data")
                                     else:
-                                        logger.debug(f"Could not find parent table for month element {j+1}")
+                                        logger.debug("Could not find parent table for month element %s", j + 1)
                                         
                                 except Exception as e:
-                                    logger.debug(f"Error processing month element {j+1}: {e}")
+                                    logger.debug("Error processing month element %s: %s", j + 1, e)
                                     continue
                     
                 except Exception as e:
-                    logger.debug(f"Selector {i+1} failed: {e}")
+                    logger.debug("Selector %s failed: %s", i + 1, e)
                     continue
             
             logger.warning(f"⚠️ No quarterly results found with any selector for {stock.nse_symbol}")
@@ -608,7 +774,7 @@ class BSEQuarterlySyncer:
             return is_quarterly
             
         except Exception as e:
-            logger.debug(f"Error analyzing table: {e}")
+            logger.debug("Error analyzing table: %s", e)
             return False
     
     def _scrape_with_requests(self, url: str, stock: Stock) -> List[Dict[str, Any]]:
@@ -616,9 +782,6 @@ class BSEQuarterlySyncer:
         try:
             logger.info(f"📡 Using requests fallback for {stock.nse_symbol}")
             
-            # Add delay to be respectful to BSE servers
-            time.sleep(2)
-            
             response = self.session.get(url, timeout=30)
             response.raise_for_status()
             
@@ -638,6 +801,7 @@ class BSEQuarterlySyncer:
     def _parse_bse_html(self, soup: BeautifulSoup, stock: Stock) -> List[Dict[str, Any]]:
         """Parse BSE HTML content for quarterly results"""
         quarterly_results = []
+        results_by_quarter = {}  # (year, quarter_num) -> record in quarterly_results
         
         logger.info(f"🔍 Parsing BSE HTML for {stock.nse_symbol}")
         
@@ -677,7 +841,7 @@ class BSEQuarterlySyncer:
                                 break
                     
                     if not header_row:
-                        logger.debug(f"Table {i+1}: No header row found with month patterns")
+                        logger.debug("Table %s: No header row found with month patterns", i + 1)
                         continue
                     
                     # Extract quarter information from header row
@@ -690,6 +854,8 @@ class BSEQuarterlySyncer:
                         if any(month in cell_text.lower() for month in ['jun-', 'mar-', 'dec-', 'sep-']):
                             quarters.append(cell_text)
                     logger.info(f"📅 Found {len(quarters)} quarters: {quarters}")
+                    # Parse each header once rather than once per metric row
+                    parsed_quarters = [self._parse_quarter_from_text(quarter) for quarter in quarters]
                     
                     # Parse data rows
                     for row in rows:
@@ -706,8 +872,8 @@ class BSEQuarterlySyncer:
                             continue
                         
                         # Check if this is a financial metric we care about
-                        if any(keyword in metric_name for keyword in ['revenue', 'sales', 'other income', 'total income', 'expenditure', 'expenses', 'interest', 'pbdt', 'depreciation', 'pbt', 'profit before tax', 'tax', 'net profit', 'equity', 'eps', 'ceps', 'opm %', 'npm %']):
-                            logger.debug(f"📊 Processing metric: {metric_name}")
+                        if _is_bse_metric(metric_name):
+                            logger.debug("📊 Processing metric: %s", metric_name)
                             
                             # Extract values for each quarter (simple sequential indexing)
                             for quarter_idx, quarter in enumerate(quarters):
@@ -723,8 +889,8 @@ class BSEQuarterlySyncer:
                                         continue
                                     
                                     try:
-                                        # Parse the quarter to get year and quarter number
-                                        quarter_data = self._parse_quarter_from_text(quarter)
+                                        # Year and quarter number parsed from the header
+                                        quarter_data = parsed_quarters[quarter_idx]
                                         if quarter_data:
                                             year, quarter_num = quarter_data
                                             
@@ -735,27 +901,24 @@ class BSEQuarterlySyncer:
                                             
                                             if quarter_record:
                                                 # Check if we already have this quarter
-                                                existing_quarter = next(
-                                                    (qr for qr in quarterly_results 
-                                                     if qr['year'] == year and qr['quarter_number'] == quarter_num), 
-                                                    None
-                                                )
+                                                existing_quarter = results_by_quarter.get((year, quarter_num))
                                                 
                                                 if existing_quarter:
                                                     # Update existing record with new metric
                                                     existing_quarter.update(quarter_record)
-                                                    logger.debug(f"✅ Updated existing {quarter_record['quarter']} record")
+                                                    logger.debug("✅ Updated existing %s record", quarter_record['quarter'])
                                                 else:
                                                     # Add new record
                                                     quarterly_results.append(quarter_record)
-                                                    logger.debug(f"✅ Added new {quarter_record['quarter']} record")
+                                                    results_by_quarter[(year, quarter_num)] = quarter_record
+                                                    logger.debug("✅ Added new %s record", quarter_record['quarter'])
                                     
                                     except Exception as e:
                                         logger.warning(f"Error processing quarter {quarter} for {metric_name}: {e}")
                                         continue
                                         
             except Exception as e:
-                logger.debug(f"Error processing table {i+1}: {e}")
+                logger.debug("Error processing table %s: %s", i + 1, e)
                 continue
         
         if quarterly_results:
@@ -796,7 +959,7 @@ class BSEQuarterlySyncer:
             return None
             
         except Exception as e:
-            logger.debug(f"Error parsing quarter text '{quarter_text}': {e}")
+            logger.debug("Error parsing quarter text '%s': %s", quarter_text, e)
             return None
     
     def _apply_screener_transformations(self, quarter_record: Dict[str, Any]):
@@ -943,43 +1106,21 @@ class BSEQuarterlySyncer:
                 'quarter_number': quarter_num,
                 'quarterly_result_link': f"https://www.bseindia.com/stock-share-price/{stock.name.lower().replace(' ', '-')}/{stock.nse_symbol.lower()}/{stock.bse_symbol}/financials-results/",
                 'source': 'BSE',
-                'filing_date': datetime.now().date(),
-                'announcement_date': datetime.now().date(),
+                'filing_date': self.sync_date,
+                'announcement_date': self.sync_date,
                 'is_consolidated': False
             }
             
             # Store raw BSE values for reference and calculations
             raw_values = {}
             
-            # Map metric names to database fields and store raw values
-            metric_mapping = {
-                'revenue': 'revenue',
-                'sales': 'revenue',  # BSE sometimes uses 'Sales' instead of 'Revenue'
-                'other income': 'other_income',
-                'total income': 'total_income',
-                'expenditure': 'expenditure',
-                'expenses': 'expenditure',  # BSE sometimes uses 'Expenses'
-                'interest': 'interest',
-                'pbdt': 'pbdt',
-                'depreciation': 'depreciation',
-                'pbt': 'pbt',
-                'profit before tax': 'pbt',  # Alternative name
-                'tax': 'tax',
-                'net profit': 'net_profit',
-                'equity': 'equity',
-                'eps': 'eps',
-                'ceps': 'ceps',
-                'opm %': 'opm_percent',
-                'npm %': 'npm_percent'
-            }
-            
             # Set the raw metric value and store for calculations
-            db_field = metric_mapping.get(metric_name)
+            db_field = BSE_METRIC_FIELDS.get(metric_name)
             if db_field:
                 # Store raw BSE value in both raw_values and quarter_record
                 raw_values[db_field] = raw_value
                 quarter_record[db_field] = raw_value
-                logger.debug(f"✅ Set {db_field} = {raw_value} (raw BSE value) for Q{quarter_num} {year}")
+                logger.debug("✅ Set %s = %s (raw BSE value) for Q%s %s", db_field, raw_value, quarter_num, year)
             
             # Note: All Screener transformations are now handled in _apply_screener_transformations
             # after all metrics for a quarter are collected
@@ -987,7 +1128,7 @@ class BSEQuarterlySyncer:
             return quarter_record
             
         except Exception as e:
-            logger.debug(f"Error creating quarterly record: {e}")
+            logger.debug("Error creating quarterly record: %s", e)
             return None
     
 
@@ -1014,7 +1155,7 @@ class BSEQuarterlySyncer:
                 # We store these values as-is in crores, no scaling needed
                 # The values should match exactly what BSE displays
                 
-                logger.debug(f"🔍 Parsed '{value_text}' -> cleaned: '{cleaned_text}' -> extracted: '{numeric_match.group(1)}' -> final: {numeric_value}")
+                logger.debug("🔍 Parsed '%s' -> cleaned: '%s' -> extracted: '%s' -> final: %s", value_text, cleaned_text, numeric_match.group(1), numeric_value)
                 
                 # BSE shows all values in crores - no scaling validation needed
                 # Values like 52,788.00 are correctly 52,788 crores
@@ -1024,7 +1165,7 @@ class BSEQuarterlySyncer:
             return None
             
         except Exception as e:
-            logger.debug(f"Error parsing numeric value '{value_text}': {e}")
+            logger.debug("Error parsing numeric value '%s': %s", value_text, e)
             return None
             
             # Look for quarterly results table
@@ -1126,7 +1267,7 @@ class BSEQuarterlySyncer:
                     quarter_match = True
             
             if not quarter_match:
-                logger.debug(f"Could not parse quarter from: {quarter_text}")
+                logger.debug("Could not parse quarter from: %s", quarter_text)
                 return None
             
             quarter_str = f"Q{quarter_num} {year}"
@@ -1136,10 +1277,10 @@ class BSEQuarterlySyncer:
             raw_values = {}
             
             # First, let's log what we're seeing for debugging
-            logger.debug(f"Parsing row for {quarter_str}: {len(cells)} cells")
+            logger.debug("Parsing row for %s: %s cells", quarter_str, len(cells))
             for i, cell in enumerate(cells):
                 cell_text = cell.get_text(strip=True)
-                logger.debug(f"Cell {i}: '{cell_text}'")
+                logger.debug("Cell %s: '%s'", i, cell_text)
             
             # Try to extract values based on column headers or position
             # BSE tables typically have: Quarter | Revenue | Other Income | Total Income | Expenditure | Interest | PBDT | Depreciation | PBT | Tax | Net Profit | Equity | EPS | CEPS | OPM% | NPM%
@@ -1157,60 +1298,60 @@ class BSEQuarterlySyncer:
                     # Use our proper parsing method to handle BSE format correctly
                     numeric_value = self._parse_numeric_value(cell_text)
                     if numeric_value is None:
-                        logger.debug(f"Cell {i} not numeric: '{cell_text}'")
+                        logger.debug("Cell %s not numeric: '%s'", i, cell_text)
                         continue
-                    logger.debug(f"Cell {i} parsed as: {numeric_value}")
+                    logger.debug("Cell %s parsed as: %s", i, numeric_value)
                     
                     # Based on typical BSE table structure, map columns to raw values
                     if i == 1:  # First column after quarter is usually Revenue
                         raw_values['revenue'] = numeric_value
-                        logger.debug(f"Set raw revenue = {numeric_value}")
+                        logger.debug("Set raw revenue = %s", numeric_value)
                     elif i == 2:  # Second might be Other Income
                         raw_values['other_income'] = numeric_value
-                        logger.debug(f"Set raw other_income = {numeric_value}")
+                        logger.debug("Set raw other_income = %s", numeric_value)
                     elif i == 3:  # Third might be Total Income
                         raw_values['total_income'] = numeric_value
-                        logger.debug(f"Set raw total_income = {numeric_value}")
+                        logger.debug("Set raw total_income = %s", numeric_value)
                     elif i == 4:  # Fourth might be Expenditure
                         raw_values['expenditure'] = numeric_value
-                        logger.debug(f"Set raw expenditure = {numeric_value}")
+                        logger.debug("Set raw expenditure = %s", numeric_value)
                     elif i == 5:  # Fifth might be Interest
                         raw_values['interest'] = numeric_value
-                        logger.debug(f"Set raw interest = {numeric_value}")
+                        logger.debug("Set raw interest = %s", numeric_value)
                     elif i == 6:  # Sixth might be PBDT
                         raw_values['pbdt'] = numeric_value
-                        logger.debug(f"Set raw pbdt = {numeric_value}")
+                        logger.debug("Set raw pbdt = %s", numeric_value)
                     elif i == 7:  # Seventh might be Depreciation
                         raw_values['depreciation'] = numeric_value
-                        logger.debug(f"Set raw depreciation = {numeric_value}")
+                        logger.debug("Set raw depreciation = %s", numeric_value)
                     elif i == 8:  # Eighth might be PBT
                         raw_values['pbt'] = numeric_value
-                        logger.debug(f"Set raw pbt = {numeric_value}")
+                        logger.debug("Set raw pbt = %s", numeric_value)
                     elif i == 9:  # Ninth might be Tax
                         raw_values['tax'] = numeric_value
-                        logger.debug(f"Set raw tax = {numeric_value}")
+                        logger.debug("Set raw tax = %s", numeric_value)
                     elif i == 10:  # Tenth might be Net Profit
                         raw_values['net_profit'] = numeric_value
-                        logger.debug(f"Set raw net_profit = {numeric_value}")
+                        logger.debug("Set raw net_profit = %s", numeric_value)
                     elif i == 11:  # Eleventh might be Equity
                         raw_values['equity'] = numeric_value
-                        logger.debug(f"Set raw equity = {numeric_value}")
+                        logger.debug("Set raw equity = %s", numeric_value)
                     elif i == 12:  # Twelfth might be EPS
                         raw_values['eps'] = numeric_value
-                        logger.debug(f"Set raw eps = {numeric_value}")
+                        logger.debug("Set raw eps = %s", numeric_value)
                     elif i == 13:  # Thirteenth might be CEPS
                         raw_values['ceps'] = numeric_value
-                        logger.debug(f"Set raw ceps = {numeric_value}")
+                        logger.debug("Set raw ceps = %s", numeric_value)
                     elif i == 14:  # Fourteenth might be OPM %
                         raw_values['opm_percent'] = numeric_value
-                        logger.debug(f"Set raw opm_percent = {numeric_value}")
+                        logger.debug("Set raw opm_percent = %s", numeric_value)
                     elif i == 15:  # Fifteenth might be NPM %
                         raw_values['npm_percent'] = numeric_value
-                        logger.debug(f"Set raw npm_percent = {numeric_value}")
+                        logger.debug("Set raw npm_percent = %s", numeric_value)
                     
                 except ValueError:
                     # Not a numeric value, skip
-                    logger.debug(f"Cell {i} not numeric: '{cell_text}'")
+                    logger.debug("Cell %s not numeric: '%s'", i, cell_text)
                     continue
             
             # Now apply the Screener/Analyst transformations based on the mapping table
@@ -1221,8 +1362,8 @@ class BSEQuarterlySyncer:
                 'quarter_number': quarter_num,
                 'quarterly_result_link': f"https://www.bseindia.com/stock-share-price/{stock.name.lower().replace(' ', '-')}/{stock.nse_symbol.lower()}/{stock.bse_symbol}/financials-results/",
                 'source': 'BSE',
-                'filing_date': datetime.now().date(),
-                'announcement_date': datetime.now().date(),
+                'filing_date': self.sync_date,
+                'announcement_date': self.sync_date,
                 'is_consolidated': True
             }
             
@@ -1231,13 +1372,13 @@ class BSEQuarterlySyncer:
             # 1. Sales/Revenue: Same (no change needed)
             if 'revenue' in raw_values:
                 quarter_record['revenue'] = raw_values['revenue']
-                logger.debug(f"✅ Sales/Revenue: {raw_values['revenue']} (same as BSE raw)")
+                logger.debug("✅ Sales/Revenue: %s (same as BSE raw)", raw_values['revenue'])
             
             # 2. Expenses (exclude Interest): BSE Expenditure - Interest
             if 'expenditure' in raw_values and 'interest' in raw_values:
                 screener_expenses = raw_values['expenditure'] - raw_values['interest']
                 quarter_record['operating_expenses'] = screener_expenses
-                logger.debug(f"✅ Screener Expenses (excl. Interest): {raw_values['expenditure']} - {raw_values['interest']} = {screener_expenses}")
+                logger.debug("✅ Screener Expenses (excl. Interest): %s - %s = %s", raw_values['expenditure'], raw_values['interest'], screener_expenses)
             
             # 3. Operating Profit (EBITDA): Apply Screener transformation rule
             # Screener definition: Operating Profit = Revenue - (Expenditure - Interest)
@@ -1245,60 +1386,60 @@ class BSEQuarterlySyncer:
                 screener_operating_profit = raw_values['revenue'] - (raw_values['expenditure'] - abs(raw_values['interest']))
                 quarter_record['ebitda'] = screener_operating_profit
                 quarter_record['operating_profit'] = screener_operating_profit
-                logger.debug(f"✅ Screener Operating Profit: Revenue ({raw_values['revenue']}) - (Expenditure ({raw_values['expenditure']}) - Interest ({abs(raw_values['interest'])})) = {screener_operating_profit}")
+                logger.debug("✅ Screener Operating Profit: Revenue (%s) - (Expenditure (%s) - Interest (%s)) = %s", raw_values['revenue'], raw_values['expenditure'], abs(raw_values['interest']), screener_operating_profit)
             elif 'pbdt' in raw_values:
                 # Fallback: If no expenditure data, use PBDT + Interest
                 screener_operating_profit = raw_values['pbdt'] + abs(raw_values['interest'])
                 quarter_record['ebitda'] = screener_operating_profit
                 quarter_record['operating_profit'] = screener_operating_profit
-                logger.debug(f"✅ Screener Operating Profit (fallback): PBDT ({raw_values['pbdt']}) + Interest ({abs(raw_values['interest'])}) = {screener_operating_profit}")
+                logger.debug("✅ Screener Operating Profit (fallback): PBDT (%s) + Interest (%s) = %s", raw_values['pbdt'], abs(raw_values['interest']), screener_operating_profit)
             
             # 4. OPM %: Calculate using Screener Operating Profit
             if 'operating_profit' in quarter_record and 'revenue' in quarter_record and quarter_record['revenue'] > 0:
                 opm_percent = (quarter_record['operating_profit'] / quarter_record['revenue']) * 100
                 quarter_record['opm_percent'] = opm_percent
-                logger.debug(f"✅ Screener OPM %: ({quarter_record['operating_profit']} / {quarter_record['revenue']}) * 100 = {opm_percent:.2f}%")
+                logger.debug("✅ Screener OPM %%: (%s / %s) * 100 = %.2f%%", quarter_record['operating_profit'], quarter_record['revenue'], opm_percent)
             
             # 5. Other Income: Same (no change needed)
             if 'other_income' in raw_values:
                 quarter_record['other_income'] = raw_values['other_income']
-                logger.debug(f"✅ Other Income: {raw_values['other_income']} (same as BSE raw)")
+                logger.debug("✅ Other Income: %s (same as BSE raw)", raw_values['other_income'])
             
             # 6. Interest: Separate line item (take directly from BSE)
             if 'interest' in raw_values:
                 quarter_record['interest'] = raw_values['interest']
-                logger.debug(f"✅ Interest: {raw_values['interest']} (separate line item)")
+                logger.debug("✅ Interest: %s (separate line item)", raw_values['interest'])
             
             # 6a. Expenditure: Store raw BSE expenditure for reference
             if 'expenditure' in raw_values:
                 quarter_record['expenditure'] = raw_values['expenditure']
-                logger.debug(f"✅ Expenditure: {raw_values['expenditure']} (raw BSE value)")
+                logger.debug("✅ Expenditure: %s (raw BSE value)", raw_values['expenditure'])
             
             # 7. Depreciation: Same (no change needed)
             if 'depreciation' in raw_values:
                 quarter_record['depreciation'] = raw_values['depreciation']
-                logger.debug(f"✅ Depreciation: {raw_values['depreciation']} (same as BSE raw)")
+                logger.debug("✅ Depreciation: %s (same as BSE raw)", raw_values['depreciation'])
             
             # 8. Profit Before Tax (PBT): Matches (no change needed)
             if 'pbt' in raw_values:
                 quarter_record['pbt'] = raw_values['pbt']
-                logger.debug(f"✅ PBT: {raw_values['pbt']} (matches BSE raw)")
+                logger.debug("✅ PBT: %s (matches BSE raw)", raw_values['pbt'])
             
             # 9. Tax %: Calculate if we have tax amount and PBT
             if 'tax' in raw_values and 'pbt' in raw_values and raw_values['pbt'] > 0:
                 tax_percent = (abs(raw_values['tax']) / raw_values['pbt']) * 100
                 quarter_record['tax_percent'] = tax_percent
-                logger.debug(f"✅ Tax %: ({abs(raw_values['tax'])} / {raw_values['pbt']}) * 100 = {tax_percent:.2f}%")
+                logger.debug("✅ Tax %%: (%s / %s) * 100 = %.2f%%", abs(raw_values['tax']), raw_values['pbt'], tax_percent)
             
             # 10. Net Profit: Same (no change needed)
             if 'net_profit' in raw_values:
                 quarter_record['net_profit'] = raw_values['net_profit']
-                logger.debug(f"✅ Net Profit: {raw_values['net_profit']} (same as BSE raw)")
+                logger.debug("✅ Net Profit: %s (same as BSE raw)", raw_values['net_profit'])
             
             # 11. EPS: Same (no change needed)
             if 'eps' in raw_values:
                 quarter_record['eps'] = raw_values['eps']
-                logger.debug(f"✅ EPS: {raw_values['eps']} (same as BSE raw)")
+                logger.debug("✅ EPS: %s (same as BSE raw)", raw_values['eps'])
             
             # Calculate additional derived metrics for Screener/Analyst view
             
@@ -1306,13 +1447,13 @@ class BSEQuarterlySyncer:
             if 'net_profit' in quarter_record and 'revenue' in quarter_record and quarter_record['revenue'] > 0:
                 net_margin = (quarter_record['net_profit'] / quarter_record['revenue']) * 100
                 quarter_record['net_margin'] = net_margin
-                logger.debug(f"✅ Net Margin %: ({quarter_record['net_profit']} / {quarter_record['revenue']}) * 100 = {net_margin:.2f}%")
+                logger.debug("✅ Net Margin %%: (%s / %s) * 100 = %.2f%%", quarter_record['net_profit'], quarter_record['revenue'], net_margin)
             
             # Total Income: Revenue + Other Income
             if 'revenue' in quarter_record and 'other_income' in quarter_record:
                 total_income = quarter_record['revenue'] + quarter_record['other_income']
                 quarter_record['total_income'] = total_income
-                logger.debug(f"✅ Total Income: {quarter_record['revenue']} + {quarter_record['other_income']} = {total_income}")
+                logger.debug("✅ Total Income: %s + %s = %s", quarter_record['revenue'], quarter_record['other_income'], total_income)
             
             # Store raw BSE values for reference (optional - you can remove if not needed)
             # quarter_record['raw_bse_values'] = raw_values  # Removed - not a valid database field
@@ -1425,126 +1566,255 @@ class BSEQuarterlySyncer:
     #     logger.error(f"❌ Error getting Yahoo Finance data for {stock.nse_symbol}: {e}")
     #     return []
     
-    def save_quarterly_results(self, stock_id: int, quarterly_results: List[Dict[str, Any]]) -> int:
-        """Save quarterly results to database"""
-        def _save_results(session):
-            saved_count = 0
-            
-            for quarter_data in quarterly_results:
-                try:
-                    # Check if quarter already exists
-                    existing = session.query(QuarterlyResult).filter(
-                        QuarterlyResult.stock_id == stock_id,
-                        QuarterlyResult.quarter == quarter_data['quarter'],
-                        QuarterlyResult.year == quarter_data['year']
-                    ).first()
-                    
-                    if existing:
-                        # Update existing record
-                        for key, value in quarter_data.items():
-                            if hasattr(existing, key) and key != 'id':
-                                setattr(existing, key, value)
-                        logger.debug(f"Updated existing quarter: {quarter_data['quarter']}")
-                    else:
-                        # Create new record
-                        new_quarter = QuarterlyResult(**quarter_data)
-                        session.add(new_quarter)
-                        saved_count += 1
-                        logger.debug(f"Added new quarter: {quarter_data['quarter']}")
-                
-                except Exception as e:
-                    logger.error(f"Error saving quarter {quarter_data.get('quarter', 'Unknown')}: {e}")
-                    continue
-            
-            return saved_count
+    def _quarterly_params(self, stock_id: int, quarterly_results: List[Dict[str, Any]]) -> Dict[Tuple[str, int], Dict[str, Any]]:
+        """Merge duplicate quarters of one stock and bind the full upsert column list, keyed by (quarter, year)
+        
+        Columns missing from the records are bound as None; defaults are applied by the caller
+        once it knows which quarters are new.
+        """
+        rows_by_quarter = {}
+        for quarter_data in quarterly_results:
+            rows_by_quarter.setdefault((quarter_data['quarter'], quarter_data['year']), {}).update(quarter_data)
+        
+        params_by_quarter = {}
+        for key, row in rows_by_quarter.items():
+            row_params = {name: row.get(name) for name in _QUARTERLY_COLUMNS}
+            row_params['stock_id'] = stock_id
+            params_by_quarter[key] = row_params
+        return params_by_quarter
+    
+    def save_quarterly_batch(self, results_by_stock: Dict[int, List[Dict[str, Any]]], session=None) -> Dict[int, int]:
+        """Save quarterly results of many stocks with one execution of the prepared upsert
+        
+        Returns:
+            Number of quarters that did not exist before, keyed by stock id
+        """
+        def _save_batch(session):
+            params_by_stock = {
+                stock_id: self._quarterly_params(stock_id, quarterly_results)
+                for stock_id, quarterly_results in results_by_stock.items()
+            }
+            params = [row for params_by_quarter in params_by_stock.values() for row in params_by_quarter.values()]
+            if not params:
+                return {stock_id: 0 for stock_id in params_by_stock}
+            
+            existing_quarters = set(
+                session.query(QuarterlyResult.stock_id, QuarterlyResult.quarter, QuarterlyResult.year).filter(
+                    QuarterlyResult.stock_id.in_(list(params_by_stock)),
+                    QuarterlyResult.quarter.in_({row['quarter'] for row in params})
+                ).all()
+            )
+            
+            # New quarters get the column defaults an ORM insert would have used; existing ones keep
+            # their stored values for anything the records leave out
+            for stock_id, params_by_quarter in params_by_stock.items():
+                for (quarter, year), row in params_by_quarter.items():
+                    if (stock_id, quarter, year) not in existing_quarters:
+                        for name, default in _QUARTERLY_COLUMNS.items():
+                            if row[name] is None and default is not None:
+                                row[name] = default
+            
+            session.execute(_QUARTERLY_UPSERT, params)
+            
+            saved_counts = {
+                stock_id: sum(1 for quarter, year in params_by_quarter if (stock_id, quarter, year) not in existing_quarters)
+                for stock_id, params_by_quarter in params_by_stock.items()
+            }
+            logger.debug("Upserted %s quarters for %s stocks", len(params), len(params_by_stock))
+            return saved_counts
+        
+        if session is not None:
+            return _save_batch(session)
+        return self.safe_db_operation(_save_batch)
+    
+    def save_quarterly_results(self, stock_id: int, quarterly_results: List[Dict[str, Any]], session=None) -> int:
+        """Save quarterly results to database
+        
+        All quarters are written with the prepared _QUARTERLY_UPSERT statement keyed on
+        (stock_id, quarter, year). Values present in a scraped record replace the stored ones;
+        metrics and metadata missing from it keep their stored value.
         
+        Returns:
+            Number of quarters that did not exist before
+        """
         try:
-            return self.safe_db_operation(_save_results)
+            return self.save_quarterly_batch({stock_id: quarterly_results}, session=session)[stock_id]
         except Exception as e:
             logger.error(f"Error in save operation: {e}")
             return 0
     
-    def sync_stock_quarterly_results(self, stock: Stock) -> int:
+    def record_sync_failure(self, stock: Stock, tracker: Optional[Dict[str, Any]], error: Exception):
+        """Mark the stock's tracker as failed, keeping the last data date already loaded with the tracker"""
+        logger.error(f"❌ Error syncing quarterly results for {stock.nse_symbol} from BSE: {error}")
+        last_data_date = tracker['last_data_date'] if tracker else None
+        try:
+            self.update_sync_tracker(stock.id, 'quarterly_results', last_data_date, 0, 'failed', str(error))
+        except Exception as e:
+            logger.error(f"❌ Error updating sync tracker for {stock.nse_symbol}: {e}")
+    
+    def persist_quarterly_batch(self, scraped: List[Tuple[Stock, List[Dict[str, Any]]]]) -> Dict[int, int]:
+        """Save the scraped results of several stocks and update their trackers in one transaction
+        
+        Every stock's tracker is marked successful, including re-scrapes that only refreshed
+        quarters already stored, so the resync window in sync_all_stocks starts from this run.
+        
+        Returns:
+            Number of new quarters saved, keyed by stock id
+        """
+        with self.session_scope() as session:
+            saved_counts = self.save_quarterly_batch(
+                {stock.id: quarterly_results for stock, quarterly_results in scraped}, session=session
+            )
+            
+            for stock, quarterly_results in scraped:
+                latest_date = max([qr.get('filing_date', self.sync_date) for qr in quarterly_results])
+                self.update_sync_tracker(stock.id, 'quarterly_results', latest_date, saved_counts[stock.id],
+                                         session=session)
+        
+        for stock, _ in scraped:
+            if saved_counts[stock.id] > 0:
+                logger.info(f"✅ Successfully saved {saved_counts[stock.id]} quarterly results for {stock.nse_symbol}")
+            else:
+                logger.warning(f"⚠️ No new quarterly results saved for {stock.nse_symbol}")
+        return saved_counts
+    
+    def scrape_stock_quarterly_results(self, stock: Stock) -> List[Dict[str, Any]]:
+        """Scrape quarterly results for a single stock from BSE, logging when none are found"""
+        logger.info(f"🔄 Syncing quarterly results for {stock.nse_symbol} ({stock.name}) from BSE")
+        
+        # Only try BSE scraping
+        quarterly_results = self.scrape_bse_quarterly_results(stock)
+        if not quarterly_results:
+            logger.warning(f"⚠️ No quarterly results found for {stock.nse_symbol} on BSE")
+        return quarterly_results
+    
+    def sync_stock_quarterly_results(self, stock: Stock, tracker: Optional[Dict[str, Any]] = None) -> int:
         """Sync quarterly results for a single stock from BSE only
         
         BSE provides financial values in crores. All values are stored in crores scale.
         Screener transformations are applied to convert BSE raw values to Screener format.
+        
+        Args:
+            stock: Stock to sync
+            tracker: Preloaded 'quarterly_results' tracker for the stock, if available
         """
+        self.sync_date = datetime.now().date()
         try:
-            logger.info(f"🔄 Syncing quarterly results for {stock.nse_symbol} ({stock.name}) from BSE")
-            
-            # Only try BSE scraping
-            quarterly_results = self.scrape_bse_quarterly_results(stock)
-            
-            if quarterly_results:
-                # Save to database
-                saved_count = self.save_quarterly_results(stock.id, quarterly_results)
-                
-                if saved_count > 0:
-                    logger.info(f"✅ Successfully saved {saved_count} quarterly results for {stock.nse_symbol}")
-                    
-                    # Update sync tracker
-                    latest_date = max([qr.get('filing_date', datetime.now().date()) for qr in quarterly_results])
-                    self.update_sync_tracker(stock.id, 'quarterly_results', latest_date, saved_count)
-                    
-                    return saved_count
-                else:
-                    logger.warning(f"⚠️ No new quarterly results saved for {stock.nse_symbol}")
-                    return 0
-            else:
-                logger.warning(f"⚠️ No quarterly results found for {stock.nse_symbol} on BSE")
+            quarterly_results = self.scrape_stock_quarterly_results(stock)
+            if not quarterly_results:
                 return 0
+            
+            return self.persist_quarterly_batch([(stock, quarterly_results)])[stock.id]
                 
         except Exception as e:
-            logger.error(f"❌ Error syncing quarterly results for {stock.nse_symbol} from BSE: {e}")
-            # Update sync tracker with error
-            self.update_sync_tracker(stock.id, 'quarterly_results', None, 0, 'failed', str(e))
+            self.record_sync_failure(stock, tracker, e)
             return 0
     
-    def sync_all_stocks(self, limit: int = None):
-        """Sync quarterly results for all stocks"""
+    def iter_stock_batches(self, batch_size: int, limit: int = None):
+        """Yield stocks with BSE codes in id order, batch_size at a time
+        
+        Each batch is read in its own short session (keyset pagination on id), so
+        only one batch of Stock instances is held at once and no cursor stays open
+        while stocks are being scraped.
+        """
+        last_id = 0
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            session = self.get_db_session()
+            try:
+                batch = session.query(Stock).filter(
+                    Stock.bse_symbol.isnot(None),
+                    Stock.id > last_id
+                ).order_by(Stock.id).limit(size).all()
+            finally:
+                self.close_session(session)
+            
+            if not batch:
+                return
+            yield batch
+            
+            last_id = batch[-1].id
+            if remaining is not None:
+                remaining -= len(batch)
+    
+    def sync_all_stocks(self, limit: int = None, batch_size: int = 10, force: bool = False):
+        """Sync quarterly results for all stocks
+        
+        Stocks are streamed and scraped one at a time, but the results of each
+        batch of batch_size stocks are written with a single upsert and commit.
+        Stocks synced successfully in the last QUARTERLY_RESYNC_DAYS days are
+        skipped unless force is set.
+        """
         logger.info("🚀 Starting BSE Quarterly Results Sync")
         
-        db = SessionLocal()
+        if not self.has_quarterly_upsert_index():
+            return
         
         try:
-            # Get all stocks with BSE codes
-            query = db.query(Stock).filter(Stock.bse_symbol.isnot(None))
+            # Get the number of stocks with BSE codes
+            total_stocks = self.safe_db_operation(
+                lambda session: session.query(func.count(Stock.id)).filter(Stock.bse_symbol.isnot(None)).scalar()
+            )
             if limit:
-                query = query.limit(limit)
+                total_stocks = min(total_stocks, limit)
+            logger.info(f"📊 Found {total_stocks} stocks to sync")
             
-            stocks = query.all()
-            logger.info(f"📊 Found {len(stocks)} stocks to sync")
+            self.sync_date = datetime.now().date()
+            resync_cutoff = datetime.utcnow() - timedelta(days=QUARTERLY_RESYNC_DAYS)
             
             total_synced = 0
             total_errors = 0
+            total_skipped = 0
+            processed = 0
             
-            for i, stock in enumerate(stocks, 1):
-                logger.info(f"🔄 Processing {i}/{len(stocks)}: {stock.nse_symbol}")
+            for batch in self.iter_stock_batches(batch_size, limit):
+                # Load the batch's trackers in one query instead of one lookup per stock
+                trackers = self.preload_trackers([stock.id for stock in batch], 'quarterly_results')
+                scraped = []
                 
-                try:
-                    synced_count = self.sync_stock_quarterly_results(stock)
-                    if synced_count > 0:
-                        total_synced += synced_count
-                    else:
-                        total_errors += 1
+                for stock in batch:
+                    processed += 1
+                    logger.info(f"🔄 Processing {processed}/{total_stocks}: {stock.nse_symbol}")
                     
-                    # Add delay between requests
-                    time.sleep(3)
+                    tracker = trackers.get(stock.id)
+                    if (not force and tracker and tracker['sync_status'] == 'success'
+                            and tracker['last_sync_time'] and tracker['last_sync_time'] >= resync_cutoff):
+                        logger.info(f"⏭️ Skipping {stock.nse_symbol}: synced within the last {QUARTERLY_RESYNC_DAYS} days")
+                        total_skipped += 1
+                        continue
                     
+                    try:
+                        quarterly_results = self.scrape_stock_quarterly_results(stock)
+                        if quarterly_results:
+                            scraped.append((stock, quarterly_results))
+                        else:
+                            total_errors += 1
+                    except Exception as e:
+                        self.record_sync_failure(stock, trackers.get(stock.id), e)
+                        total_errors += 1
+                
+                if not scraped:
+                    continue
+                
+                try:
+                    saved_counts = self.persist_quarterly_batch(scraped)
                 except Exception as e:
-                    logger.error(f"❌ Error processing {stock.nse_symbol}: {e}")
-                    total_errors += 1
+                    for stock, _ in scraped:
+                        self.record_sync_failure(stock, trackers.get(stock.id), e)
+                    total_errors += len(scraped)
                     continue
+                
+                # Re-scrapes that only refreshed stored quarters succeeded too, with nothing new to count
+                total_synced += sum(saved_counts[stock.id] for stock, _ in scraped)
             
             logger.info("🎉 BSE Quarterly Results Sync completed!")
             logger.info(f"✅ Total quarters synced: {total_synced}")
             logger.info(f"❌ Total errors: {total_errors}")
+            logger.info(f"⏭️ Total skipped (recently synced): {total_skipped}")
             
         except Exception as e:
             logger.error(f"❌ Fatal error: {e}")
-        finally:
-            db.close()
 
 def main():
     """Main function"""
@@ -1552,22 +1822,20 @@ def main():
     syncer = BSEQuarterlySyncer()
     
     try:
-        # Test stocks: Reliance, TCS, Infosys
-        test_stocks = ['HDFCBANK', 'ITC', 'DLF']
+        if not syncer.has_quarterly_upsert_index():
+            return
         
-        logger.info(f"🧪 Testing with {len(test_stocks)} stocks: {', '.join(test_stocks)}")
+        logger.info(f"🧪 Testing with {len(TEST_SYMBOLS)} stocks: {', '.join(TEST_SYMBOLS)}")
         
-        db = SessionLocal()
-        try:
-            for symbol in test_stocks:
-                stock = db.query(Stock).filter(Stock.nse_symbol == symbol).first()
-                if stock:
-                    logger.info(f"🧪 Testing {symbol}...")
-                    syncer.sync_stock_quarterly_results(stock)
-                else:
-                    logger.warning(f"Stock {symbol} not found in database")
-        finally:
-            db.close()
+        stocks_by_symbol = syncer.preload_stocks(TEST_SYMBOLS)
+        trackers = syncer.preload_trackers([stock.id for stock in stocks_by_symbol.values()], 'quarterly_results')
+        for symbol in TEST_SYMBOLS:
+            stock = stocks_by_symbol.get(symbol)
+            if stock:
+                logger.info(f"🧪 Testing {symbol}...")
+                syncer.sync_stock_quarterly_results(stock, tracker=trackers.get(stock.id))
+            else:
+                logger.warning(f"Stock {symbol} not found in database")
         
         # If testing successful, ask user if they want to proceed with all stocks
         response = input("\n🧪 Test completed. Proceed with syncing all stocks? (y/n): ")
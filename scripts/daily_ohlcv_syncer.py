@@ -22,16 +22,24 @@ Usage:
 """
 
 import argparse
+import atexit
+import csv
+import io
 import logging
-import time
+import logging.handlers
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, date
 from typing import List, Optional, Dict, Any, Tuple
 import yfinance as yf
+import numpy as np
 import pandas as pd
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, load_only, sessionmaker
+from sqlalchemy import and_, func, select
 
 from app.core.database import SessionLocal
+from app.core.http import TokenBucket, create_http_session
 from app.models.stock import Stock, DailyPrice, SyncTracker
 
 # Configure logging
@@ -39,43 +47,166 @@ import os
 # Create logs directory if it doesn't exist
 os.makedirs('logs', exist_ok=True)
 
+class _BatchedFileHandler(logging.handlers.MemoryHandler):
+    """Buffer log records and append each batch to the target file in a single write
+    
+    MemoryHandler alone replays the buffer through the target's emit(), which still flushes
+    the file once per record.
+    """
+    def flush(self):
+        with self.lock:
+            if self.target is None or not self.buffer:
+                return
+            try:
+                text = ''.join(self.format(record) + self.target.terminator for record in self.buffer)
+                with self.target.lock:
+                    self.target.stream.write(text)
+                    self.target.flush()
+            except Exception:
+                self.target.handleError(self.buffer[-1])
+            self.buffer.clear()
+
+_log_file_handler = logging.FileHandler('logs/daily_ohlcv_sync.log')
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('logs/daily_ohlcv_sync.log'),
+        _log_file_handler,
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
+def _batch_log_file_writes():
+    """Send the sync log file through a _BatchedFileHandler, for command-line runs only
+    
+    Per-stock progress lines then reach the file in batches of up to 1024, while warnings and
+    errors flush at once. Processes that merely import this module (e.g. the API server) keep
+    the plain file handler, so their log lines are never held back.
+    """
+    root = logging.getLogger()
+    if _log_file_handler not in root.handlers:
+        return
+    
+    batched = _BatchedFileHandler(1024, flushLevel=logging.WARNING, target=_log_file_handler)
+    batched.setFormatter(_log_file_handler.formatter)
+    root.removeHandler(_log_file_handler)
+    root.addHandler(batched)
+    atexit.register(batched.flush)
+
+# Yahoo 'period' windows for incremental syncs: (max calendar days behind, period)
+INCREMENTAL_PERIODS = [(5, '5d'), (30, '1mo'), (90, '3mo')]
+
+# Pace of Yahoo history requests
+YAHOO_REQUESTS_PER_SECOND = 5
+
+# Stocks per sync batch, and concurrent Yahoo requests used to prefetch a batch's recent windows
+SYNC_BATCH_SIZE = 20
+YAHOO_FETCH_WORKERS = 8
+
+# Stocks of a batch synced in parallel, each worker on its own DB session
+SYNC_WORKERS = 8
+
+# Stocks with at least this many new prices are loaded with PostgreSQL COPY instead of INSERTs
+COPY_THRESHOLD = 100
+_COPY_COLUMNS = ('stock_id', 'date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume', 'turnover')
+
+# Columns kept from Yahoo history frames and their dtypes; float64 keeps the exact prices stored in
+# the DB and lets volumes carry NaN
+YAHOO_OHLCV_DTYPES = {'Open': 'float64', 'High': 'float64', 'Low': 'float64', 'Close': 'float64', 'Volume': 'float64'}
+
 class DailyOHLCVSyncer:
-    def __init__(self, validation_tolerance: float = 0.01):
+    def __init__(self, validation_tolerance: float = 0.01, bind: Optional[Engine] = None):
         """
         Initialize the daily OHLCV syncer.
         
         Args:
             validation_tolerance: Tolerance for price validation (1% by default)
+            bind: Engine whose connection pool the syncer's sessions share (the app engine by default)
         """
         self.validation_tolerance = validation_tolerance
-        self.db = SessionLocal()
+        self._session_factory = SessionLocal if bind is None else sessionmaker(autocommit=False, autoflush=False, bind=bind)
+        
+        # Sessions are not thread-safe: each thread gets its own, all closed together in close_sessions()
+        self._local = threading.local()
+        self._sessions: List[Session] = []
+        self._sessions_lock = threading.Lock()
+        
+        # Shared HTTP session: pooled keep-alive connections, backoff on rate limits
+        self.http = create_http_session()
+        self.rate_limiter = TokenBucket(YAHOO_REQUESTS_PER_SECOND)
+        
+        # 'ohlcv' tracker ids of the current batch, keyed by stock id (None: stock has no tracker yet)
+        self.tracker_ids: Dict[int, Optional[int]] = {}
         
+        # Latest DB prices preloaded for the running sync, keyed by stock id (None: no prices yet)
+        self.latest_prices: Dict[int, Optional[Dict[str, Any]]] = {}
+        
+        # Ids of stocks already loaded, keyed by NSE and BSE symbol; plain ints stay valid across sessions
+        self._stock_ids: Dict[str, int] = {}
+
+        
+    @property
+    def db(self) -> Session:
+        """Database session of the calling thread"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._session_factory()
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+    
+    def close_sessions(self):
+        """Close the database sessions of every thread that used the syncer"""
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
+    
     def get_all_stocks(self) -> List[Stock]:
-        """Get all active stocks from database"""
+        """Get all active stocks from database
+        
+        Only the columns the sync reads are loaded, so the fundamentals and the long business
+        summary of every stock are not fetched. The other columns load on first access while the
+        stock is still attached to its session.
+        """
         try:
-            stocks = self.db.query(Stock).filter(Stock.is_active == True).all()
+            stocks = self.db.query(Stock).options(
+                load_only(Stock.id, Stock.name, Stock.nse_symbol, Stock.bse_symbol)
+            ).filter(Stock.is_active == True).all()
+            for stock in stocks:
+                self._cache_stock(stock)
             logger.info(f"📊 Found {len(stocks)} active stocks to sync")
             return stocks
         except Exception as e:
             logger.error(f"❌ Error getting stocks: {e}")
             return []
     
+    def _cache_stock(self, stock: Stock):
+        """Remember a loaded stock's id under both of its symbols"""
+        for symbol in (stock.nse_symbol, stock.bse_symbol):
+            if symbol:
+                self._stock_ids[symbol] = stock.id
+    
     def get_stock_by_symbol(self, symbol: str) -> Optional[Stock]:
-        """Get stock by BSE or NSE symbol"""
+        """Get stock by BSE or NSE symbol, by primary key once its id is known
+        
+        The stock always comes from the calling thread's session (its identity map, or a
+        primary-key lookup), so every attribute stays loadable.
+        """
         try:
+            stock_id = self._stock_ids.get(symbol)
+            if stock_id is not None:
+                return self.db.get(Stock, stock_id)
+            
             stock = self.db.query(Stock).filter(
                 (Stock.bse_symbol == symbol) | (Stock.nse_symbol == symbol)
             ).first()
+            if stock:
+                self._cache_stock(stock)
             return stock
         except Exception as e:
             logger.error(f"❌ Error getting stock {symbol}: {e}")
@@ -89,27 +220,63 @@ class DailyOHLCVSyncer:
             ).order_by(DailyPrice.date.desc()).first()
             
             if latest_price:
-                return {
-                    'date': latest_price.date.date(),  # Convert datetime to date
-                    'open': latest_price.open_price,
-                    'high': latest_price.high_price,
-                    'low': latest_price.low_price,
-                    'close': latest_price.close_price,
-                    'volume': latest_price.volume
-                }
+                return self._latest_price_record(latest_price)
             return None
         except Exception as e:
             logger.error(f"❌ Error getting latest OHLCV for {stock.nse_symbol}: {e}")
             return None
     
+    @staticmethod
+    def _latest_price_record(price) -> Dict[str, Any]:
+        """Latest-price dict from a DailyPrice or a row with the same columns"""
+        return {
+            'date': price.date.date(),  # Convert datetime to date
+            'open': price.open_price,
+            'high': price.high_price,
+            'low': price.low_price,
+            'close': price.close_price,
+            'volume': price.volume
+        }
+    
+    def get_latest_ohlcv_for_all(self) -> Dict[int, Dict[str, Any]]:
+        """Get the latest OHLCV row of every stock in one query, keyed by stock id
+        
+        PostgreSQL picks each stock's newest row with DISTINCT ON over the (stock_id, date)
+        index; other databases rank the rows with ROW_NUMBER() instead.
+        """
+        columns = (
+            DailyPrice.stock_id, DailyPrice.date, DailyPrice.open_price, DailyPrice.high_price,
+            DailyPrice.low_price, DailyPrice.close_price, DailyPrice.volume
+        )
+        try:
+            if self.db.get_bind().dialect.name == 'postgresql':
+                query = select(*columns).distinct(DailyPrice.stock_id).order_by(
+                    DailyPrice.stock_id, DailyPrice.date.desc()
+                )
+            else:
+                ranked = select(
+                    *columns,
+                    func.row_number().over(
+                        partition_by=DailyPrice.stock_id, order_by=DailyPrice.date.desc()
+                    ).label('rn')
+                ).subquery()
+                query = select(*(ranked.c[column.key] for column in columns)).where(ranked.c.rn == 1)
+            
+            return {row.stock_id: self._latest_price_record(row) for row in self.db.execute(query)}
+        except Exception as e:
+            logger.error(f"❌ Error getting latest OHLCV for all stocks: {e}")
+            self.db.rollback()
+            return {}
+    
     def fetch_yahoo_data(self, stock: Stock, start_date: datetime, end_date: datetime) -> Optional[pd.DataFrame]:
         """Fetch OHLCV data from Yahoo Finance (up to 5 years of historical data)"""
         try:
             # Use NSE symbol for Yahoo Finance
             symbol = f"{stock.nse_symbol}.NS"
-            ticker = yf.Ticker(symbol)
+            ticker = yf.Ticker(symbol, session=self.http)
             
             # Fetch data
+            self.rate_limiter.acquire()
             data = ticker.history(start=start_date, end=end_date)
             
             if data.empty:
@@ -117,57 +284,119 @@ class DailyOHLCVSyncer:
                 return None
                 
             logger.info(f"📈 Fetched {len(data)} records from Yahoo Finance for {symbol}")
-            return data
+            return self._ohlcv_frame(data)
             
         except Exception as e:
             logger.error(f"❌ Error fetching Yahoo data for {stock.nse_symbol}: {e}")
             return None
     
-    def validate_ohlcv_data(self, db_data: Dict[str, Any], yahoo_data: pd.Series) -> bool:
+    def fetch_recent_yahoo_data(self, stock: Stock, period: str) -> Optional[pd.DataFrame]:
+        """Fetch the most recent OHLCV window (e.g. '5d', '1mo') from Yahoo Finance"""
+        try:
+            symbol = f"{stock.nse_symbol}.NS"
+            ticker = yf.Ticker(symbol, session=self.http)
+            
+            self.rate_limiter.acquire()
+            data = ticker.history(period=period)
+            
+            if data.empty:
+                logger.warning(f"⚠️ No recent data from Yahoo Finance for {symbol}")
+                return None
+            
+            return self._ohlcv_frame(data)
+            
+        except Exception as e:
+            logger.error(f"❌ Error fetching recent Yahoo data for {stock.nse_symbol}: {e}")
+            return None
+    
+    @staticmethod
+    def _ohlcv_frame(data: pd.DataFrame) -> pd.DataFrame:
+        """Keep only the OHLCV columns of a Yahoo history frame, cast once to fixed dtypes
+        
+        Dividends and Stock Splits are dropped, and later steps read the columns as float64
+        arrays without converting them again.
+        """
+        return data[list(YAHOO_OHLCV_DTYPES)].astype(YAHOO_OHLCV_DTYPES, copy=False)
+    
+    def validate_ohlcv_data(self, db_data: pd.DataFrame, yahoo_data: pd.DataFrame) -> np.ndarray:
         """
-        Validate if database data matches Yahoo Finance data within tolerance
+        Validate database rows against Yahoo Finance rows within tolerance, all dates in one pass
         
         Args:
-            db_data: Latest data from database
-            yahoo_data: Corresponding data from Yahoo Finance
+            db_data: Database rows with open/high/low/close/volume columns
+            yahoo_data: Yahoo Finance rows (Open/High/Low/Close/Volume) for the same dates, in the same order
             
         Returns:
-            True if data matches within tolerance, False otherwise
+            Boolean array with one entry per database row, True where the row matches within
+            tolerance; all False when either side is empty or the frames are not aligned
         """
         try:
-            if not db_data or yahoo_data.empty:
-                return False
-            
-            # Check each price field
-            fields = ['open', 'high', 'low', 'close']
-            yahoo_field_map = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close'}
-            for field in fields:
-                db_value = db_data[field]
-                yahoo_value = float(yahoo_data[yahoo_field_map[field]])
-                
-                if db_value is None or yahoo_value is None:
-                    continue
-                    
-                # Calculate percentage difference
-                diff = abs(db_value - yahoo_value) / db_value
-                
-                if diff > self.validation_tolerance:
-                    logger.warning(f"⚠️ {field} validation failed: DB={db_value}, Yahoo={yahoo_value}, Diff={diff:.4f}")
-                    return False
-            
-            # Check volume (more lenient tolerance for volume)
-            if db_data['volume'] and yahoo_data['Volume']:
-                volume_diff = abs(db_data['volume'] - int(yahoo_data['Volume'])) / db_data['volume']
-                if volume_diff > 0.1:  # 10% tolerance for volume
-                    logger.warning(f"⚠️ Volume validation failed: DB={db_data['volume']}, Yahoo={int(yahoo_data['Volume'])}, Diff={volume_diff:.4f}")
-                    return False
-            
-            logger.info("✅ Data validation passed")
-            return True
+            if db_data.empty or yahoo_data.empty:
+                return np.zeros(len(db_data), dtype=bool)
+            
+            valid = self.validate_ohlcv_arrays(
+                db_data[['open', 'high', 'low', 'close']].to_numpy(dtype='float64'),
+                yahoo_data[['Open', 'High', 'Low', 'Close']].to_numpy(dtype='float64'),
+                db_data['volume'].to_numpy(dtype='float64'),
+                yahoo_data['Volume'].to_numpy(dtype='float64')
+            )
+            
+            failed = int((~valid).sum())
+            if failed:
+                logger.warning(f"⚠️ Validation failed for {failed} of {len(valid)} rows")
+            else:
+                logger.info("✅ Data validation passed")
+            return valid
             
         except Exception as e:
             logger.error(f"❌ Error during validation: {e}")
-            return False
+            return np.zeros(len(db_data), dtype=bool)
+    
+    def validate_ohlcv_arrays(self, db_prices: np.ndarray, yahoo_prices: np.ndarray,
+                              db_volume: np.ndarray, yahoo_volume: np.ndarray) -> np.ndarray:
+        """
+        Validate aligned OHLCV arrays within tolerance, without building any pandas objects
+        
+        Args:
+            db_prices: (rows, 4) float array of stored open/high/low/close
+            yahoo_prices: (rows, 4) float array of Yahoo open/high/low/close for the same rows
+            db_volume: Stored volumes, NaN where missing
+            yahoo_volume: Yahoo volumes, NaN where missing
+            
+        Returns:
+            Boolean array with one entry per row, True where the row matches within tolerance.
+            A row with a missing, zero or negative price on either side never matches.
+            
+        Raises:
+            ValueError: If the arrays do not describe the same number of rows of four prices
+        """
+        # A flat array holds a single row (or none)
+        db_prices = np.asarray(db_prices, dtype='float64').reshape(-1, 4)
+        yahoo_prices = np.asarray(yahoo_prices, dtype='float64').reshape(-1, 4)
+        db_volume = np.asarray(db_volume, dtype='float64').ravel()
+        yahoo_volume = np.asarray(yahoo_volume, dtype='float64').ravel()
+        
+        rows = len(db_prices)
+        if len(yahoo_prices) != rows or len(db_volume) != rows or len(yahoo_volume) != rows:
+            raise ValueError(
+                f"OHLCV arrays are not aligned: prices {db_prices.shape} vs {yahoo_prices.shape}, "
+                f"volumes {len(db_volume)} vs {len(yahoo_volume)}"
+            )
+        
+        # Percentage differences relative to the stored values, only computed where both prices are usable
+        prices_usable = np.isfinite(db_prices) & np.isfinite(yahoo_prices) & (db_prices > 0) & (yahoo_prices > 0)
+        price_diff = np.divide(
+            np.abs(db_prices - yahoo_prices), db_prices, out=np.zeros_like(db_prices), where=prices_usable
+        )
+        prices_ok = prices_usable.all(axis=1) & (price_diff <= self.validation_tolerance).all(axis=1)
+        
+        # Volume only counts when both sides report it, with a more lenient 10% tolerance
+        volume_checked = np.isfinite(db_volume) & np.isfinite(yahoo_volume) & (db_volume > 0) & (yahoo_volume > 0)
+        volume_diff = np.divide(
+            np.abs(db_volume - yahoo_volume), db_volume, out=np.zeros_like(db_volume), where=volume_checked
+        )
+        volume_ok = volume_diff <= 0.1
+        return prices_ok & volume_ok
     
     def delete_all_ohlcv_data(self, stock_id: int) -> bool:
         """Delete all OHLCV data for a stock"""
@@ -193,7 +422,7 @@ class DailyOHLCVSyncer:
                 return 0
             
             # Get existing dates for this stock to avoid duplicates
-            dates_list = [date.date() for date in data.index]
+            dates_list = list(data.index.date)
             existing_dates = set()
             
             # Query existing dates in batches to avoid memory issues
@@ -208,63 +437,104 @@ class DailyOHLCVSyncer:
                 ).all()
                 existing_dates.update({row[0] for row in existing_query})
             
-            # Filter out existing records
-            new_data = data[~data.index.map(lambda x: x.date()).isin(existing_dates)]
+            # Pull the columns out once as plain Python lists instead of boxing every row
+            prices = data[['Open', 'High', 'Low', 'Close']].to_numpy(dtype='float64', copy=False).tolist()
+            volumes = data['Volume'].to_numpy(dtype='float64', copy=False).tolist()
+            has_volume = data['Volume'].notna().to_numpy().tolist()
             
-            if new_data.empty:
-                logger.info("✅ No new data to save")
-                return 0
-            
-            # Prepare bulk insert data
-            bulk_data = []
-            for date, row in new_data.iterrows():
-                bulk_data.append({
+            # Prepare bulk insert data, skipping dates already stored
+            bulk_data = [
+                {
                     'stock_id': stock_id,
-                    'date': date.date(),
-                    'open_price': float(row['Open']),
-                    'high_price': float(row['High']),
-                    'low_price': float(row['Low']),
-                    'close_price': float(row['Close']),
-                    'volume': int(row['Volume']) if pd.notna(row['Volume']) else None,
-                    'turnover': float(row['Open'] * row['Volume']) if pd.notna(row['Volume']) else None,
+                    'date': day,
+                    'open_price': open_price,
+                    'high_price': high_price,
+                    'low_price': low_price,
+                    'close_price': close_price,
+                    'volume': int(volume) if volume_present else None,
+                    'turnover': open_price * volume if volume_present else None,
                     'vwap': None,
                     'delivery_quantity': None,
                     'delivery_percentage': None
-                })
-            
-            # Bulk insert using SQLAlchemy bulk_insert_mappings
-            if bulk_data:
-                # Insert in batches to avoid memory issues
-                batch_size = 1000
-                total_saved = 0
-                for i in range(0, len(bulk_data), batch_size):
-                    batch = bulk_data[i:i + batch_size]
-                    self.db.bulk_insert_mappings(DailyPrice, batch)
-                    total_saved += len(batch)
-                
-                self.db.commit()
-                logger.info(f"💾 Saved {total_saved} new OHLCV records")
-                return total_saved
-            else:
+                }
+                for day, (open_price, high_price, low_price, close_price), volume, volume_present
+                in zip(dates_list, prices, volumes, has_volume)
+                if day not in existing_dates
+            ]
+            
+            if not bulk_data:
                 logger.info("✅ No new data to save")
                 return 0
             
+            total_saved = self._bulk_insert_prices(bulk_data)
+            self.db.commit()
+            logger.info(f"💾 Saved {total_saved} new OHLCV records")
+            return total_saved
+            
         except Exception as e:
             logger.error(f"❌ Error saving OHLCV data: {e}")
             self.db.rollback()
             return 0
     
+    def _bulk_insert_prices(self, rows: List[Dict[str, Any]]) -> int:
+        """Insert price rows in the current transaction, streaming large batches through COPY on PostgreSQL"""
+        if len(rows) < COPY_THRESHOLD or self.db.get_bind().dialect.name != 'postgresql':
+            self.db.bulk_insert_mappings(DailyPrice, rows)
+            return len(rows)
+        
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {DailyPrice.__tablename__} ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                self._copy_buffer(rows)
+            )
+        finally:
+            cursor.close()
+        return len(rows)
+    
+    @staticmethod
+    def _copy_buffer(rows: List[Dict[str, Any]]) -> io.StringIO:
+        """Write price rows as COPY CSV input, one line per row in _COPY_COLUMNS order
+        
+        None is written as an empty field, which CSV-format COPY loads as NULL; id and
+        created_at are not sent and come from their column defaults.
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([row[column] for column in _COPY_COLUMNS] for row in rows)
+        buffer.seek(0)
+        return buffer
+    
+    def preload_trackers(self, stock_ids: List[int]):
+        """Load the 'ohlcv' tracker ids of many stocks in one query, replacing the tracker cache"""
+        try:
+            existing = dict(
+                self.db.query(SyncTracker.stock_id, SyncTracker.id).filter(
+                    and_(
+                        SyncTracker.stock_id.in_(stock_ids),
+                        SyncTracker.data_type == 'ohlcv'
+                    )
+                ).all()
+            )
+            self.tracker_ids = {stock_id: existing.get(stock_id) for stock_id in stock_ids}
+        except Exception as e:
+            logger.error(f"❌ Error preloading sync trackers: {e}")
+            self.db.rollback()
+            self.tracker_ids = {}
+    
     def update_sync_tracker(self, stock_id: int, last_data_date: datetime, records_count: int, status: str = 'success', error_message: str = None):
-        """Update sync tracker for a stock"""
+        """Update sync tracker for a stock, by primary key when the tracker id is already known"""
         try:
-            tracker = self.db.query(SyncTracker).filter(
-                and_(
-                    SyncTracker.stock_id == stock_id,
-                    SyncTracker.data_type == 'ohlcv'
-                )
-            ).first()
+            if stock_id in self.tracker_ids:
+                tracker_id = self.tracker_ids[stock_id]
+            else:
+                tracker_id = self.db.query(SyncTracker.id).filter(
+                    and_(
+                        SyncTracker.stock_id == stock_id,
+                        SyncTracker.data_type == 'ohlcv'
+                    )
+                ).scalar()
             
-            if not tracker:
+            if tracker_id is None:
                 tracker = SyncTracker(
                     stock_id=stock_id,
                     data_type='ohlcv',
@@ -275,29 +545,54 @@ class DailyOHLCVSyncer:
                     error_message=error_message
                 )
                 self.db.add(tracker)
+                self.db.flush()
+                tracker_id = tracker.id
             else:
-                tracker.last_sync_time = datetime.utcnow()
-                tracker.last_data_date = last_data_date
-                tracker.records_count = records_count
-                tracker.sync_status = status
-                tracker.error_message = error_message
+                self.db.query(SyncTracker).filter(SyncTracker.id == tracker_id).update({
+                    SyncTracker.last_sync_time: datetime.utcnow(),
+                    SyncTracker.last_data_date: last_data_date,
+                    SyncTracker.records_count: records_count,
+                    SyncTracker.sync_status: status,
+                    SyncTracker.error_message: error_message
+                }, synchronize_session=False)
             
             self.db.commit()
+            self.tracker_ids[stock_id] = tracker_id
             
         except Exception as e:
             logger.error(f"❌ Error updating sync tracker: {e}")
             self.db.rollback()
+            self.tracker_ids.pop(stock_id, None)
     
-    def get_yahoo_latest_date(self, stock: Stock) -> Optional[date]:
+    @staticmethod
+    def incremental_period(days_behind: int) -> Optional[str]:
+        """Smallest Yahoo period covering a gap of days_behind, or None when a full refresh is due"""
+        return next((period for max_days, period in INCREMENTAL_PERIODS if days_behind <= max_days), None)
+    
+    def fetch_recent_yahoo_data_batch(self, stocks: List[Stock], period: str) -> Dict[int, Optional[pd.DataFrame]]:
+        """Fetch the same recent window for a batch of stocks, keyed by stock id
+        
+        Yahoo's chart API serves one symbol per request, so the batch goes out as concurrent
+        requests over the pooled session, still paced by the shared rate limiter.
+        """
+        if not stocks:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=min(YAHOO_FETCH_WORKERS, len(stocks))) as executor:
+            windows = executor.map(lambda stock: self.fetch_recent_yahoo_data(stock, period), stocks)
+            return {stock.id: data for stock, data in zip(stocks, windows)}
+    
+    def get_yahoo_latest_date(self, stock: Stock, end_date: Optional[datetime] = None) -> Optional[date]:
         """Get the latest available date from Yahoo Finance for a stock"""
         try:
             symbol = f"{stock.nse_symbol}.NS"
-            ticker = yf.Ticker(symbol)
+            ticker = yf.Ticker(symbol, session=self.http)
             
             # Fetch just the last few days to get the latest date
-            end_date = datetime.now()
+            end_date = end_date or datetime.now()
             start_date = end_date - timedelta(days=7)
             
+            self.rate_limiter.acquire()
             data = ticker.history(start=start_date, end=end_date)
             
             if data.empty:
@@ -309,44 +604,70 @@ class DailyOHLCVSyncer:
         except Exception as e:
             logger.error(f"❌ Error getting Yahoo latest date for {stock.nse_symbol}: {e}")
             return None
-
-    def sync_stock_ohlcv(self, stock: Stock, validate_only: bool = False) -> Tuple[bool, str]:
+    
+    def sync_stock_ohlcv(self, stock: Stock, validate_only: bool = False,
+                         recent_windows: Optional[Dict[int, Optional[pd.DataFrame]]] = None) -> Tuple[bool, str]:
         """
         Sync OHLCV data for a single stock with improved incremental logic
         
         Args:
             stock: Stock object to sync
             validate_only: If True, only validate existing data without fetching new data
+            recent_windows: Recent Yahoo windows prefetched for the batch, keyed by stock id
             
         Returns:
             Tuple of (success, message)
         """
         try:
             logger.info(f"🔄 Syncing OHLCV for {stock.nse_symbol} ({stock.name})")
+            now = datetime.now()
             
-            # Get latest data from database
-            latest_db_data = self.get_latest_ohlcv_data(stock)
+            # Get latest data from database, preloaded by sync_all_stocks when available
+            if stock.id in self.latest_prices:
+                latest_db_data = self.latest_prices.pop(stock.id)
+            else:
+                latest_db_data = self.get_latest_ohlcv_data(stock)
+            yahoo_data = None
             
             if not latest_db_data:
                 logger.info(f"📊 No existing data for {stock.nse_symbol}, fetching complete data")
                 # Fetch complete data (2 years for better performance)
-                start_date = datetime.now() - timedelta(days=730)  # 2 years
-                end_date = datetime.now()
+                start_date = now - timedelta(days=730)  # 2 years
+                end_date = now
             else:
                 # Check if we need to validate
                 if validate_only:
                     logger.info(f"🔍 Validation only mode for {stock.nse_symbol}")
                     return True, "Validation completed"
                 
-                # Get latest date from Yahoo Finance
-                yahoo_latest_date = self.get_yahoo_latest_date(stock)
+                db_latest_date = latest_db_data['date']
+                days_behind = (now.date() - db_latest_date).days
+                
+                # DB already has today's bar, nothing newer can exist on Yahoo
+                if days_behind <= 0:
+                    logger.info(f"✅ {stock.nse_symbol} data is up to date (DB: {db_latest_date})")
+                    return True, "Data is up to date"
+                
+                # A small period window sized to the gap answers both "what is Yahoo's latest
+                # date" and "which rows are new" in one request; very stale stocks only need
+                # the latest date since they get a full refresh anyway
+                recent_period = self.incremental_period(days_behind)
+                recent_data = None
+                if recent_period:
+                    # Prefetched windows are fetched with this same period
+                    if recent_windows is not None and stock.id in recent_windows:
+                        recent_data = recent_windows[stock.id]
+                    else:
+                        recent_data = self.fetch_recent_yahoo_data(stock, recent_period)
+                    yahoo_latest_date = recent_data.index[-1].date() if recent_data is not None else None
+                else:
+                    yahoo_latest_date = self.get_yahoo_latest_date(stock, end_date=now)
                 
                 if not yahoo_latest_date:
                     logger.warning(f"⚠️ Could not get latest date from Yahoo for {stock.nse_symbol}")
                     return False, "Could not get latest date from Yahoo"
                 
                 # Compare dates - both should now be date objects
-                db_latest_date = latest_db_data['date']
                 yahoo_latest_date_only = yahoo_latest_date
                 
                 logger.info(f"📅 DB latest: {db_latest_date}, Yahoo latest: {yahoo_latest_date_only}")
@@ -369,20 +690,24 @@ class DailyOHLCVSyncer:
                     if not self.delete_all_ohlcv_data(stock.id):
                         return False, "Failed to delete existing data"
                     
-                    start_date = datetime.now() - timedelta(days=730)  # 2 years
-                    end_date = datetime.now()
+                    start_date = now - timedelta(days=730)  # 2 years
+                    end_date = now
+                elif recent_data is not None:
+                    # Normal incremental sync - keep only rows after DB latest from the window
+                    yahoo_data = recent_data[recent_data.index.date > db_latest_date]
                 else:
                     # Normal incremental sync - fetch from next day after DB latest
                     start_date = datetime.combine(db_latest_date + timedelta(days=1), datetime.min.time())
-                    end_date = datetime.now()
+                    end_date = now
                     
                     # If start_date is today or future, no new data needed
                     if start_date >= end_date:
                         logger.info(f"✅ {stock.nse_symbol} data is up to date")
                         return True, "Data is up to date"
             
-            # Fetch data from Yahoo Finance
-            yahoo_data = self.fetch_yahoo_data(stock, start_date, end_date)
+            # Fetch data from Yahoo Finance unless the incremental window already covered it
+            if yahoo_data is None:
+                yahoo_data = self.fetch_yahoo_data(stock, start_date, end_date)
             
             if yahoo_data is None or yahoo_data.empty:
                 logger.warning(f"⚠️ No new data available for {stock.nse_symbol}")
@@ -416,6 +741,14 @@ class DailyOHLCVSyncer:
                 logger.warning("⚠️ No stocks found to sync")
                 return {"total": 0, "success": 0, "failed": 0}
             
+            # Detach the loaded stocks so worker threads never lazy-load through this thread's session
+            self.db.expunge_all()
+            
+            # Latest DB price of every stock in one query instead of one per stock
+            latest = self.get_latest_ohlcv_for_all()
+            self.latest_prices = {stock.id: latest.get(stock.id) for stock in stocks}
+            today = datetime.now().date()
+            
             total_stocks = len(stocks)
             success_count = 0
             failed_count = 0
@@ -424,32 +757,55 @@ class DailyOHLCVSyncer:
             logger.info(f"🔧 Validation tolerance: {self.validation_tolerance*100:.1f}%")
             
             # Process in batches to avoid memory issues and improve performance
-            batch_size = 20
-            for batch_start in range(0, total_stocks, batch_size):
-                batch_end = min(batch_start + batch_size, total_stocks)
-                batch_stocks = stocks[batch_start:batch_end]
-                
-                logger.info(f"📦 Processing batch {batch_start//batch_size + 1}: stocks {batch_start+1}-{batch_end}")
-                
-                for i, stock in enumerate(batch_stocks, batch_start + 1):
-                    logger.info(f"📈 Progress: {i}/{total_stocks} - {stock.nse_symbol}")
+            batch_size = SYNC_BATCH_SIZE
+            with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as executor:
+                for batch_start in range(0, total_stocks, batch_size):
+                    batch_end = min(batch_start + batch_size, total_stocks)
+                    batch_stocks = stocks[batch_start:batch_end]
                     
-                    success, message = self.sync_stock_ohlcv(stock, validate_only)
+                    logger.info(f"📦 Processing batch {batch_start//batch_size + 1}: stocks {batch_start+1}-{batch_end}")
                     
-                    if success:
-                        success_count += 1
-                        logger.info(f"✅ {stock.nse_symbol}: {message}")
-                    else:
-                        failed_count += 1
-                        logger.error(f"❌ {stock.nse_symbol}: {message}")
+                    # One tracker query per batch instead of one per synced stock
+                    self.preload_trackers([stock.id for stock in batch_stocks])
                     
-                    # Minimal delay for better performance
-                    if i < total_stocks:
-                        time.sleep(0.05)
-                
-                # Commit after each batch
-                self.db.commit()
-                logger.info(f"✅ Batch {batch_start//batch_size + 1} completed. Success: {success_count}, Failed: {failed_count}")
+                    # Prefetch each stock's incremental window, one batch request per period so nobody
+                    # downloads a wider window than its gap needs; stocks that are up to date, have no
+                    # prices or are too far behind skip the prefetch
+                    recent_windows = None
+                    if not validate_only:
+                        due_by_period = {}
+                        for stock in batch_stocks:
+                            latest_price = self.latest_prices.get(stock.id)
+                            if not latest_price:
+                                continue
+                            days_behind = (today - latest_price['date']).days
+                            period = self.incremental_period(days_behind) if days_behind > 0 else None
+                            if period:
+                                due_by_period.setdefault(period, []).append(stock)
+                        
+                        recent_windows = {}
+                        for period, due_stocks in due_by_period.items():
+                            recent_windows.update(self.fetch_recent_yahoo_data_batch(due_stocks, period))
+                    
+                    # Each stock commits its own work on its worker's session
+                    futures = {
+                        executor.submit(self.sync_stock_ohlcv, stock, validate_only, recent_windows=recent_windows): stock
+                        for stock in batch_stocks
+                    }
+                    for i, future in enumerate(as_completed(futures), batch_start + 1):
+                        stock = futures[future]
+                        logger.info(f"📈 Progress: {i}/{total_stocks} - {stock.nse_symbol}")
+                        
+                        success, message = future.result()
+                        
+                        if success:
+                            success_count += 1
+                            logger.info(f"✅ {stock.nse_symbol}: {message}")
+                        else:
+                            failed_count += 1
+                            logger.error(f"❌ {stock.nse_symbol}: {message}")
+                    
+                    logger.info(f"✅ Batch {batch_start//batch_size + 1} completed. Success: {success_count}, Failed: {failed_count}")
             
             # Final summary
             logger.info("🎉 Daily OHLCV sync completed!")
@@ -465,12 +821,13 @@ class DailyOHLCVSyncer:
             logger.error(f"❌ Error during daily sync: {e}")
             return {"total": 0, "success": 0, "failed": 0}
         finally:
-            self.db.close()
+            self.latest_prices = {}
+            self.close_sessions()
     
     def close(self):
-        """Close database connection"""
-        if self.db:
-            self.db.close()
+        """Close database connections and HTTP session"""
+        self.close_sessions()
+        self.http.close()
 
 def main():
     parser = argparse.ArgumentParser(description='Daily OHLCV Data Syncer')
@@ -479,6 +836,7 @@ def main():
     parser.add_argument('--tolerance', type=float, default=0.01, help='Validation tolerance (default: 0.01 = 1%)')
     
     args = parser.parse_args()
+    _batch_log_file_writes()
     
     logger.info("🚀 Starting Daily OHLCV Syncer")
     logger.info(f"⚙️ Configuration: tolerance={args.tolerance*100:.1f}%, validate_only={args.validate_only}")
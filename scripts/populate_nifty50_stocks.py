@@ -9,18 +9,22 @@ It automatically handles new stocks added to the list and updates existing stock
 import os
 import sys
 import logging
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from itertools import groupby
+from typing import Dict, List, Optional, Any, Set
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 import yfinance as yf
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from app.core.database import SessionLocal
+from app.core.http import TokenBucket, create_http_session
 from app.models.stock import Stock
 
 # Configure logging
@@ -56,6 +60,13 @@ NIFTY_50_SYMBOLS = [
     "WIPRO.NS", "ZEEL.NS"
 ]
 
+# Symbols fetched per yf.Tickers batch
+YAHOO_BATCH_SIZE = 20
+# Worker threads processing the symbols of a batch concurrently
+MAX_WORKERS = 8
+# Pace of ticker.info requests, shared by all worker threads
+YAHOO_REQUESTS_PER_SECOND = 5
+
 class Nifty50StockPopulator:
     """Populates database with Nifty 50 stocks using Yahoo Finance data"""
     
@@ -68,6 +79,17 @@ class Nifty50StockPopulator:
             'errors': 0,
             'skipped': 0
         }
+        # Worker threads share the stats counters
+        self._stats_lock = threading.Lock()
+        
+        # Shared HTTP session: pooled keep-alive connections, backoff on rate limits
+        self.http = create_http_session()
+        self.rate_limiter = TokenBucket(YAHOO_REQUESTS_PER_SECOND)
+    
+    def increment_stat(self, key: str):
+        """Increment a stats counter; safe to call from worker threads"""
+        with self._stats_lock:
+            self.stats[key] += 1
     
     def get_db_session(self) -> Session:
         """Get a fresh database session"""
@@ -91,11 +113,13 @@ class Nifty50StockPopulator:
         finally:
             self.close_session(session)
     
-    def get_stock_info_from_yahoo(self, symbol: str) -> Optional[Dict[str, Any]]:
+    def get_stock_info_from_yahoo(self, symbol: str, ticker: Optional[yf.Ticker] = None) -> Optional[Dict[str, Any]]:
         """Get stock information from Yahoo Finance ticker.info"""
         try:
             logger.info(f"Fetching info for {symbol}")
-            ticker = yf.Ticker(symbol)
+            if ticker is None:
+                ticker = yf.Ticker(symbol, session=self.http)
+            self.rate_limiter.acquire()
             info = ticker.info
             
             if not info or 'regularMarketPrice' not in info:
@@ -172,13 +196,13 @@ class Nifty50StockPopulator:
         
         return stock
     
-    def process_stock(self, symbol: str) -> bool:
-        """Process a single stock symbol"""
+    def process_stock(self, symbol: str, ticker: Optional[yf.Ticker] = None) -> bool:
+        """Process a single stock symbol, reusing a pre-built ticker from a batch if given"""
         try:
             # Get stock info from Yahoo Finance
-            stock_data = self.get_stock_info_from_yahoo(symbol)
+            stock_data = self.get_stock_info_from_yahoo(symbol, ticker=ticker)
             if not stock_data:
-                self.stats['errors'] += 1
+                self.increment_stat('errors')
                 return False
             
             # Process in database
@@ -189,25 +213,25 @@ class Nifty50StockPopulator:
                 if existing_stock:
                     # Update existing stock
                     self.update_existing_stock(session, existing_stock, stock_data)
-                    self.stats['existing_stocks_updated'] += 1
+                    self.increment_stat('existing_stocks_updated')
                     logger.info(f"Updated existing stock: {stock_data['name']} ({nse_symbol})")
                 else:
                     # Add new stock
                     self.add_new_stock(session, stock_data)
-                    self.stats['new_stocks_added'] += 1
+                    self.increment_stat('new_stocks_added')
                     logger.info(f"Added new stock: {stock_data['name']} ({nse_symbol})")
                 
                 return True
             
             success = self.safe_db_operation(_process_stock_db)
             if success:
-                self.stats['total_processed'] += 1
+                self.increment_stat('total_processed')
                 logger.info(f"✅ Successfully processed {symbol}")
             return success
             
         except Exception as e:
             logger.error(f"Error processing {symbol}: {e}")
-            self.stats['errors'] += 1
+            self.increment_stat('errors')
             return False
     
     def get_current_database_stocks(self) -> List[str]:
@@ -218,17 +242,19 @@ class Nifty50StockPopulator:
         
         return self.safe_db_operation(_get_stocks)
     
-    def find_new_stocks(self) -> List[str]:
+    def find_new_stocks(self, current_stocks: Optional[Set[str]] = None) -> List[str]:
         """Find stocks that are in Nifty 50 but not in database"""
-        current_stocks = set(self.get_current_database_stocks())
+        if current_stocks is None:
+            current_stocks = set(self.get_current_database_stocks())
         nifty_stocks = set([symbol.replace('.NS', '') for symbol in NIFTY_50_SYMBOLS])
         
         new_stocks = nifty_stocks - current_stocks
         return [f"{symbol}.NS" for symbol in new_stocks]
     
-    def find_removed_stocks(self) -> List[str]:
+    def find_removed_stocks(self, current_stocks: Optional[Set[str]] = None) -> List[str]:
         """Find stocks that are in database but no longer in Nifty 50"""
-        current_stocks = set(self.get_current_database_stocks())
+        if current_stocks is None:
+            current_stocks = set(self.get_current_database_stocks())
         nifty_stocks = set([symbol.replace('.NS', '') for symbol in NIFTY_50_SYMBOLS])
         
         removed_stocks = current_stocks - nifty_stocks
@@ -237,17 +263,20 @@ class Nifty50StockPopulator:
     def fix_duplicate_isin_issues(self):
         """Fix stocks with duplicate or problematic ISIN values"""
         def _fix_isin(session):
-            # Find stocks with 'Unknown' ISIN
-            problematic_stocks = session.query(Stock).filter(Stock.isin == 'Unknown').all()
+            # Give every stock with an 'Unknown' ISIN a unique ISIN-like identifier in one UPDATE;
+            # stocks without an NSE symbol are left alone, as the identifier would be NULL
+            fixed = session.execute(
+                update(Stock)
+                .where(Stock.nse_symbol.isnot(None), Stock.isin == 'Unknown')
+                .values(isin='IN_' + Stock.nse_symbol + '_YF', updated_at=datetime.utcnow())
+                .returning(Stock.nse_symbol, Stock.isin)
+                .execution_options(synchronize_session=False)
+            ).all()
             
-            for stock in problematic_stocks:
-                # Generate unique ISIN-like identifier
-                new_isin = f"IN_{stock.nse_symbol}_YF"
-                stock.isin = new_isin
-                stock.updated_at = datetime.utcnow()
-                logger.info(f"Fixed ISIN for {stock.nse_symbol}: {new_isin}")
+            for nse_symbol, new_isin in fixed:
+                logger.info(f"Fixed ISIN for {nse_symbol}: {new_isin}")
             
-            return len(problematic_stocks)
+            return len(fixed)
         
         try:
             fixed_count = self.safe_db_operation(_fix_isin)
@@ -261,29 +290,29 @@ class Nifty50StockPopulator:
     def fix_duplicate_bse_symbol_issues(self):
         """Fix stocks with duplicate BSE symbol values"""
         def _fix_bse_symbol(session):
-            # Find stocks with duplicate BSE symbols
-            from sqlalchemy import func
-            duplicate_bse = session.query(
-                Stock.bse_symbol, 
-                func.count(Stock.id)
-            ).group_by(Stock.bse_symbol).having(func.count(Stock.id) > 1).all()
+            # Load every stock sharing its BSE symbol with another in one query
+            duplicate_bse = session.query(Stock.bse_symbol).filter(
+                Stock.bse_symbol.isnot(None),
+                Stock.bse_symbol != '',
+                ~Stock.bse_symbol.contains('_', autoescape=True)  # Only fix if not already fixed
+            ).group_by(Stock.bse_symbol).having(func.count(Stock.id) > 1)
+            stocks_with_duplicate = session.query(Stock.id, Stock.bse_symbol, Stock.nse_symbol).filter(
+                Stock.bse_symbol.in_(duplicate_bse)
+            ).order_by(Stock.bse_symbol, Stock.id).all()
             
-            fixed_count = 0
-            for bse_symbol, count in duplicate_bse:
-                if bse_symbol and '_' not in bse_symbol:  # Only fix if not already fixed
-                    stocks_with_duplicate = session.query(Stock).filter(
-                        Stock.bse_symbol == bse_symbol
-                    ).all()
-                    
-                    for i, stock in enumerate(stocks_with_duplicate):
-                        if i > 0:  # Keep first one as is, fix others
-                            new_bse_symbol = f"{bse_symbol}_{stock.nse_symbol}"
-                            stock.bse_symbol = new_bse_symbol
-                            stock.updated_at = datetime.utcnow()
-                            logger.info(f"Fixed BSE symbol for {stock.nse_symbol}: {new_bse_symbol}")
-                            fixed_count += 1
+            updates = []
+            updated_at = datetime.utcnow()
+            for bse_symbol, stocks in groupby(stocks_with_duplicate, key=lambda stock: stock.bse_symbol):
+                for stock in list(stocks)[1:]:  # Keep first one as is, fix others
+                    new_bse_symbol = f"{bse_symbol}_{stock.nse_symbol}"
+                    updates.append({'id': stock.id, 'bse_symbol': new_bse_symbol, 'updated_at': updated_at})
+                    logger.info(f"Fixed BSE symbol for {stock.nse_symbol}: {new_bse_symbol}")
             
-            return fixed_count
+            # One executemany UPDATE by primary key instead of flushing each loaded stock
+            if updates:
+                session.execute(update(Stock).execution_options(synchronize_session=False), updates)
+            
+            return len(updates)
         
         try:
             fixed_count = self.safe_db_operation(_fix_bse_symbol)
@@ -302,9 +331,10 @@ class Nifty50StockPopulator:
         # Create logs directory if it doesn't exist
         os.makedirs('logs', exist_ok=True)
         
-        # Check for new and removed stocks
-        new_stocks = self.find_new_stocks()
-        removed_stocks = self.find_removed_stocks()
+        # Check for new and removed stocks against one read of the current symbols
+        current_stocks = set(self.get_current_database_stocks())
+        new_stocks = self.find_new_stocks(current_stocks)
+        removed_stocks = self.find_removed_stocks(current_stocks)
         
         if new_stocks:
             logger.info(f"🆕 Found {len(new_stocks)} new stocks to add: {', '.join(new_stocks)}")
@@ -324,20 +354,25 @@ class Nifty50StockPopulator:
         if bse_fixed_count > 0:
             logger.info(f"✅ Fixed {bse_fixed_count} BSE symbol issues before proceeding")
         
-        # Process all stocks
-        for i, symbol in enumerate(NIFTY_50_SYMBOLS, 1):
-            logger.info(f"🔄 Processing {i}/{len(NIFTY_50_SYMBOLS)}: {symbol}")
-            
-            success = self.process_stock(symbol)
-            
-            if success:
-                logger.info(f"✅ Successfully processed {symbol}")
-            else:
-                logger.error(f"❌ Failed to process {symbol}")
+        # Process all stocks in batches sharing one yf.Tickers over the pooled HTTP session
+        for start in range(0, len(NIFTY_50_SYMBOLS), YAHOO_BATCH_SIZE):
+            batch = NIFTY_50_SYMBOLS[start:start + YAHOO_BATCH_SIZE]
+            tickers = yf.Tickers(batch, session=self.http)
             
-            # Add delay to avoid overwhelming Yahoo Finance
-            if i < len(NIFTY_50_SYMBOLS):
-                time.sleep(1)
+            # Each worker uses its own DB session through safe_db_operation
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                futures = {}
+                for i, symbol in enumerate(batch, start + 1):
+                    logger.info(f"🔄 Processing {i}/{len(NIFTY_50_SYMBOLS)}: {symbol}")
+                    future = executor.submit(self.process_stock, symbol, tickers.tickers.get(symbol.upper()))
+                    futures[future] = symbol
+                
+                for future in as_completed(futures):
+                    symbol = futures[future]
+                    if future.result():
+                        logger.info(f"✅ Successfully processed {symbol}")
+                    else:
+                        logger.error(f"❌ Failed to process {symbol}")
         
         # Print summary
         self.print_summary()
@@ -0,0 +1,34 @@
+"""Shared test setup: a throwaway SQLite database and working directory
+
+The app engine is created when app.core.database is imported, so the database URL has to
+be in the environment before any test module imports app or scripts code.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_WORKDIR = tempfile.mkdtemp(prefix='stock-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_WORKDIR, 'test.db')}"
+os.environ['DEBUG'] = 'false'
+
+# Scripts write their log files to ./logs
+os.makedirs(os.path.join(_WORKDIR, 'logs'), exist_ok=True)
+os.chdir(_WORKDIR)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db():
+    """Fresh schema for each test, with a session that is closed afterwards"""
+    from app.core.database import SessionLocal, create_tables, drop_tables
+    
+    drop_tables()
+    create_tables()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,50 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+import pytest
+
+import scripts.apply_db_indexes as migration
+import scripts.bse_quarterly_syncer as bse
+
+
+@pytest.fixture
+def legacy_engine(tmp_path, monkeypatch):
+    """Database created before the quarterly unique key was declared on the model"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE quarterly_results ('
+            'id INTEGER PRIMARY KEY, stock_id INTEGER, quarter TEXT, year INTEGER, source TEXT)'
+        ))
+        connection.execute(text('CREATE TABLE daily_prices (id INTEGER PRIMARY KEY, stock_id INTEGER, date DATETIME)'))
+        connection.execute(text(
+            "INSERT INTO quarterly_results (id, stock_id, quarter, year, source) VALUES "
+            "(1, 1, 'Q1', 2025, 'old'), (2, 1, 'Q1', 2025, 'new'), (3, 1, 'Q2', 2025, 'BSE')"
+        ))
+    monkeypatch.setattr(migration, 'engine', engine)
+    monkeypatch.setattr(bse, 'SessionLocal', sessionmaker(bind=engine))
+    monkeypatch.setattr(bse, 'SELENIUM_AVAILABLE', False)
+    yield engine
+    engine.dispose()
+
+
+def test_apply_indexes_removes_duplicates_before_unique_index(legacy_engine):
+    assert migration.apply_indexes() == 0
+    
+    with legacy_engine.connect() as connection:
+        rows = connection.execute(text('SELECT id, source FROM quarterly_results ORDER BY id')).all()
+    assert [tuple(row) for row in rows] == [(2, 'new'), (3, 'BSE')]
+    
+    unique_indexes = [index['name'] for index in inspect(legacy_engine).get_indexes('quarterly_results') if index['unique']]
+    assert unique_indexes == ['uq_quarterly_stock_quarter_year']
+    
+    # Re-running is a no-op
+    assert migration.apply_indexes() == 0
+
+
+def test_syncer_refuses_to_sync_without_unique_key(legacy_engine):
+    syncer = bse.BSEQuarterlySyncer()
+    assert syncer.has_quarterly_upsert_index() is False
+    
+    migration.apply_indexes()
+    assert syncer.has_quarterly_upsert_index() is True
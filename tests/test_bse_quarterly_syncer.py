@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import scripts.bse_quarterly_syncer as bse
+from app.models.stock import Stock, QuarterlyResult, SyncTracker
+
+
+def _quarter(quarter='Q1', year=2025, **metrics):
+    return {'quarter': quarter, 'year': year, 'quarter_number': int(quarter[1]), 'filing_date': datetime(2025, 7, 15), 'source': 'BSE', **metrics}
+
+
+@pytest.fixture
+def syncer(monkeypatch):
+    # Never start a browser in tests
+    monkeypatch.setattr(bse, 'SELENIUM_AVAILABLE', False)
+    return bse.BSEQuarterlySyncer()
+
+
+@pytest.fixture
+def stock(db):
+    stock = Stock(name='HDFC Bank', nse_symbol='HDFCBANK', bse_symbol='500180', isin='INE040A01034')
+    db.add(stock)
+    db.commit()
+    return stock
+
+
+def _tracker(db, stock_id):
+    db.expire_all()
+    return db.query(SyncTracker).filter_by(stock_id=stock_id, data_type='quarterly_results').one_or_none()
+
+
+def test_second_run_skips_recently_synced_stock(db, syncer, stock, monkeypatch):
+    scrapes = []
+    
+    def fake_scrape(scraped_stock):
+        scrapes.append(scraped_stock.nse_symbol)
+        return [_quarter(revenue=100.0)]
+    
+    monkeypatch.setattr(syncer, 'scrape_stock_quarterly_results', fake_scrape)
+    
+    syncer.sync_all_stocks()
+    assert scrapes == ['HDFCBANK']
+    tracker = _tracker(db, stock.id)
+    assert tracker is not None and tracker.sync_status == 'success'
+    
+    syncer.sync_all_stocks()
+    assert scrapes == ['HDFCBANK']
+    
+    syncer.sync_all_stocks(force=True)
+    assert scrapes == ['HDFCBANK', 'HDFCBANK']
+
+
+def test_rescrape_without_new_quarters_refreshes_tracker(db, syncer, stock, monkeypatch):
+    monkeypatch.setattr(syncer, 'scrape_stock_quarterly_results', lambda s: [_quarter(revenue=100.0)])
+    syncer.sync_all_stocks()
+    
+    stale = datetime.utcnow() - timedelta(days=bse.QUARTERLY_RESYNC_DAYS + 1)
+    db.query(SyncTracker).update({SyncTracker.last_sync_time: stale})
+    db.commit()
+    
+    # Same quarter again: nothing new is saved, but the sync still counts as a success
+    syncer.sync_all_stocks()
+    tracker = _tracker(db, stock.id)
+    assert tracker.sync_status == 'success'
+    assert tracker.records_count == 0
+    assert tracker.last_sync_time > stale
+    assert db.query(QuarterlyResult).count() == 1
+
+
+def test_failed_sync_creates_failed_tracker(db, syncer, stock, monkeypatch):
+    def failing_scrape(scraped_stock):
+        raise RuntimeError('BSE page changed')
+    
+    monkeypatch.setattr(syncer, 'scrape_stock_quarterly_results', failing_scrape)
+    syncer.sync_all_stocks()
+    
+    tracker = _tracker(db, stock.id)
+    assert tracker.sync_status == 'failed'
+    assert tracker.error_message == 'BSE page changed'
+
+
+def test_upsert_replaces_present_values_and_keeps_missing_ones(db, syncer, stock):
+    syncer.save_quarterly_results(stock.id, [_quarter(
+        revenue=100.0, net_profit=10.0, quarterly_result_link='https://bse/old', is_consolidated=True
+    )])
+    
+    # Restated filing without revenue, link or consolidation flag
+    restated = _quarter(net_profit=12.0, source='BSE-restated')
+    restated['filing_date'] = datetime(2025, 8, 1)
+    syncer.save_quarterly_results(stock.id, [restated])
+    
+    db.expire_all()
+    result = db.query(QuarterlyResult).one()
+    assert result.revenue == 100.0
+    assert result.net_profit == 12.0
+    assert result.filing_date == datetime(2025, 8, 1)
+    assert result.source == 'BSE-restated'
+    assert result.quarterly_result_link == 'https://bse/old'
+    assert result.is_consolidated is True
+
+
+def test_new_quarter_gets_column_defaults(db, syncer, stock):
+    record = _quarter(revenue=100.0)
+    del record['source']
+    syncer.save_quarterly_results(stock.id, [record])
+    
+    db.expire_all()
+    result = db.query(QuarterlyResult).one()
+    assert result.source == 'BSE'
+    assert result.is_consolidated is False
@@ -0,0 +1,274 @@
+import threading
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import scripts.daily_ohlcv_syncer as daily
+from app.core.database import engine
+from app.models.stock import DailyPrice, Stock, SyncTracker
+
+
+@pytest.fixture
+def syncer():
+    return daily.DailyOHLCVSyncer(validation_tolerance=0.01)
+
+
+def _prices(*rows):
+    return np.array(rows, dtype='float64')
+
+
+def test_validation_flags_rows_outside_tolerance(syncer):
+    db_prices = _prices([100, 102, 99, 101], [100, 102, 99, 101], [100, 102, 99, 101])
+    yahoo_prices = _prices([100.5, 102, 99, 101], [103, 102, 99, 101], [100, 102, 99, 101])
+    db_volume = np.array([1000, 1000, 1000.0])
+    yahoo_volume = np.array([1050, 1000, 1200.0])
+    
+    valid = syncer.validate_ohlcv_arrays(db_prices, yahoo_prices, db_volume, yahoo_volume)
+    
+    # Within 1%; open off by 3%; volume off by 20%
+    assert valid.tolist() == [True, False, False]
+
+
+def test_validation_skips_missing_volume(syncer):
+    prices = _prices([100, 102, 99, 101], [100, 102, 99, 101], [100, 102, 99, 101])
+    
+    valid = syncer.validate_ohlcv_arrays(
+        prices, prices, np.array([np.nan, 0, 1000.0]), np.array([1000, 1000, np.nan])
+    )
+    
+    assert valid.tolist() == [True, True, True]
+
+
+def test_validation_rejects_zero_and_missing_prices(syncer):
+    db_prices = _prices([0, 102, 99, 101], [np.nan, 102, 99, 101], [100, 102, 99, 101], [100, 102, 99, 101])
+    yahoo_prices = _prices([100, 102, 99, 101], [100, 102, 99, 101], [0, 102, 99, 101], [np.nan, 102, 99, 101])
+    volume = np.full(4, 1000.0)
+    
+    with np.errstate(all='raise'):
+        valid = syncer.validate_ohlcv_arrays(db_prices, yahoo_prices, volume, volume)
+    
+    assert valid.tolist() == [False, False, False, False]
+
+
+def test_validation_rejects_misaligned_arrays(syncer):
+    prices = _prices([100, 102, 99, 101], [100, 102, 99, 101])
+    
+    with pytest.raises(ValueError):
+        syncer.validate_ohlcv_arrays(prices, prices[:1], np.full(2, 1000.0), np.full(2, 1000.0))
+    with pytest.raises(ValueError):
+        syncer.validate_ohlcv_arrays(prices, prices, np.full(2, 1000.0), np.full(3, 1000.0))
+
+
+def _db_frame(rows):
+    return pd.DataFrame(rows, columns=['open', 'high', 'low', 'close', 'volume'])
+
+
+def _yahoo_frame(rows):
+    return pd.DataFrame(rows, columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+
+
+def test_frame_validation_handles_missing_stored_volume(syncer):
+    db_data = _db_frame([[100, 102, 99, 101, None], [100, 102, 99, 101, 1000]])
+    yahoo_data = _yahoo_frame([[100, 102, 99, 101, 5000], [100, 102, 99, 110, 1000]])
+    
+    assert syncer.validate_ohlcv_data(db_data, yahoo_data).tolist() == [True, False]
+
+
+def test_frame_validation_fails_every_row_of_misaligned_frames(syncer):
+    db_data = _db_frame([[100, 102, 99, 101, 1000]] * 3)
+    yahoo_data = _yahoo_frame([[100, 102, 99, 101, 1000]] * 2)
+    
+    assert syncer.validate_ohlcv_data(db_data, yahoo_data).tolist() == [False, False, False]
+    assert syncer.validate_ohlcv_data(db_data, yahoo_data.iloc[:0]).tolist() == [False, False, False]
+
+
+def _price_row(day, volume=1000):
+    return {
+        'stock_id': 7, 'date': day, 'open_price': 100.5, 'high_price': 102.0, 'low_price': 99.0,
+        'close_price': 101.25, 'volume': volume, 'turnover': 100.5 * volume if volume is not None else None,
+        'vwap': None, 'delivery_quantity': None, 'delivery_percentage': None
+    }
+
+
+def test_copy_columns_follow_daily_prices_table_order():
+    table_columns = [column.name for column in DailyPrice.__table__.columns]
+    assert [column for column in table_columns if column in daily._COPY_COLUMNS] == list(daily._COPY_COLUMNS)
+
+
+def test_copy_buffer_writes_missing_volume_as_null_fields():
+    buffer = daily.DailyOHLCVSyncer._copy_buffer([
+        _price_row(date(2025, 1, 2)),
+        _price_row(datetime(2025, 1, 3), volume=None),
+    ])
+    
+    assert buffer.read().splitlines() == [
+        '7,2025-01-02,100.5,102.0,99.0,101.25,1000,100500.0',
+        '7,2025-01-03 00:00:00,100.5,102.0,99.0,101.25,,',
+    ]
+
+
+def test_large_batches_use_copy_on_postgresql(syncer):
+    copies = []
+    
+    class FakeCursor:
+        closed = False
+        
+        def copy_expert(self, sql, buffer):
+            copies.append((sql, buffer.read()))
+        
+        def close(self):
+            self.closed = True
+    
+    cursor = FakeCursor()
+    syncer._local.session = SimpleNamespace(
+        get_bind=lambda: SimpleNamespace(dialect=SimpleNamespace(name='postgresql')),
+        connection=lambda: SimpleNamespace(connection=SimpleNamespace(cursor=lambda: cursor)),
+    )
+    rows = [_price_row(date(2025, 1, 2))] * daily.COPY_THRESHOLD
+    
+    assert syncer._bulk_insert_prices(rows) == daily.COPY_THRESHOLD
+    
+    sql, data = copies[0]
+    assert sql == (
+        'COPY daily_prices (stock_id, date, open_price, high_price, low_price, close_price, volume, turnover) '
+        'FROM STDIN WITH (FORMAT csv)'
+    )
+    assert len(data.splitlines()) == daily.COPY_THRESHOLD
+    assert cursor.closed
+
+
+def test_large_batches_fall_back_to_executemany_on_other_databases(db, syncer):
+    stock = Stock(name='Infosys', nse_symbol='INFY', bse_symbol='500209', isin='INE009A01021')
+    db.add(stock)
+    db.commit()
+    
+    days = pd.date_range('2024-01-01', periods=daily.COPY_THRESHOLD + 5, freq='D')
+    data = pd.DataFrame({
+        'Open': 100.0, 'High': 102.0, 'Low': 99.0, 'Close': 101.0,
+        'Volume': [np.nan] + [1000.0] * (len(days) - 1)
+    }, index=days)
+    
+    try:
+        assert syncer.save_ohlcv_data(stock.id, data) == len(days)
+    finally:
+        syncer.close_sessions()
+    
+    stored = db.query(DailyPrice).filter_by(stock_id=stock.id).order_by(DailyPrice.date).all()
+    assert len(stored) == len(days)
+    assert stored[0].volume is None and stored[0].turnover is None
+    assert stored[1].volume == 1000
+
+
+class FakeTicker:
+    """Stands in for yf.Ticker: daily bars up to today, or an error for symbols in failing"""
+    calls = []
+    failing = set()
+    lock = threading.Lock()
+    
+    def __init__(self, symbol, session=None):
+        self.symbol = symbol
+    
+    def history(self, period=None, start=None, end=None):
+        with self.lock:
+            self.calls.append((self.symbol, period or 'range'))
+        if self.symbol in self.failing:
+            raise ConnectionError('Yahoo is down')
+        
+        today = pd.Timestamp(datetime.now().date())
+        if period:
+            days = pd.date_range(end=today, periods={'5d': 5, '1mo': 30, '3mo': 90}[period], freq='D')
+        else:
+            days = pd.date_range(pd.Timestamp(start.date()), today, freq='D')
+        return pd.DataFrame({
+            'Open': 100.0, 'High': 102.0, 'Low': 99.0, 'Close': 101.0, 'Volume': 1000.0,
+            'Dividends': 0.0, 'Stock Splits': 0.0
+        }, index=days)
+
+
+def test_sync_all_stocks_over_several_batches(db, monkeypatch):
+    # Calendar days each stock's stored prices are behind (None: no prices yet)
+    days_behind = {'NOPRICES': None, 'THREEDAYS': 3, 'TENDAYS': 10, 'CURRENT': 0, 'YAHOODOWN': 3}
+    today = datetime.now().date()
+    stocks = {}
+    for i, (symbol, behind) in enumerate(days_behind.items()):
+        stock = Stock(name=symbol.title(), nse_symbol=symbol, bse_symbol=str(500000 + i), isin=f'INE{i:09d}')
+        db.add(stock)
+        db.flush()
+        stocks[symbol] = stock.id
+        if behind is not None:
+            for lag in range(behind, behind + 5):
+                db.add(DailyPrice(
+                    stock_id=stock.id, date=datetime.combine(today - timedelta(days=lag), datetime.min.time()),
+                    open_price=100.0, high_price=102.0, low_price=99.0, close_price=101.0, volume=1000
+                ))
+    db.commit()
+    
+    monkeypatch.setattr(daily, 'SYNC_BATCH_SIZE', 2)
+    monkeypatch.setattr(daily.yf, 'Ticker', FakeTicker)
+    monkeypatch.setattr(FakeTicker, 'calls', [])
+    monkeypatch.setattr(FakeTicker, 'failing', {'YAHOODOWN.NS'})
+    
+    syncer = daily.DailyOHLCVSyncer()
+    
+    # Record every worker session and whether it was closed
+    created_sessions = []
+    session_factory = syncer._session_factory
+    
+    def tracked_session():
+        session = session_factory()
+        close = session.close
+        entry = {'closed': False}
+        
+        def tracked_close():
+            entry['closed'] = True
+            close()
+        
+        session.close = tracked_close
+        created_sessions.append(entry)
+        return session
+    
+    syncer._session_factory = tracked_session
+    
+    tracker_updates = []
+    update_sync_tracker = syncer.update_sync_tracker
+    
+    def tracked_update(stock_id, *args, **kwargs):
+        tracker_updates.append(stock_id)
+        return update_sync_tracker(stock_id, *args, **kwargs)
+    
+    monkeypatch.setattr(syncer, 'update_sync_tracker', tracked_update)
+    
+    results = syncer.sync_all_stocks()
+    
+    assert results == {'total': 5, 'success': 4, 'failed': 1}
+    
+    # Each stock went to Yahoo at most once, prefetched with the period its gap needs
+    assert sorted(FakeTicker.calls) == sorted([
+        ('NOPRICES.NS', 'range'), ('THREEDAYS.NS', '5d'), ('TENDAYS.NS', '1mo'), ('YAHOODOWN.NS', '5d')
+    ])
+    
+    # Every session was closed and handed its connection back
+    assert created_sessions and all(entry['closed'] for entry in created_sessions)
+    assert syncer._sessions == []
+    assert engine.pool.checkedout() == 0
+    
+    synced = [stocks['NOPRICES'], stocks['THREEDAYS'], stocks['TENDAYS']]
+    assert sorted(tracker_updates) == sorted(synced)
+    
+    db.expire_all()
+    trackers = {tracker.stock_id: tracker for tracker in db.query(SyncTracker).filter_by(data_type='ohlcv')}
+    assert sorted(trackers) == sorted(synced)
+    assert trackers[stocks['THREEDAYS']].records_count == 3
+    assert trackers[stocks['TENDAYS']].records_count == 10
+    
+    def stored_days(symbol):
+        return db.query(DailyPrice).filter_by(stock_id=stocks[symbol]).count()
+    
+    assert stored_days('NOPRICES') == trackers[stocks['NOPRICES']].records_count > 700
+    assert stored_days('THREEDAYS') == 8
+    assert stored_days('TENDAYS') == 15
+    assert stored_days('CURRENT') == 5
+    assert stored_days('YAHOODOWN') == 5